@@ -0,0 +1,257 @@
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+# Counters are summed per bucket, wait_max keeps the largest, gauges keep the
+# last value seen
+COUNTER_FIELDS = ["joins", "scans", "advances", "wait_count", "wait_sum", "wait_max"]
+GAUGE_FIELDS = ["queue_length", "premium_count", "guests_in_venue"]
+FIELDS = COUNTER_FIELDS + GAUGE_FIELDS
+
+# (bucket seconds, buckets kept, buckets per stored item): an hour of seconds,
+# a day of minutes and thirty days of hours
+RESOLUTIONS = {
+    "second": (1, 3600, 60),
+    "minute": (60, 1440, 60),
+    "hour": (3600, 720, 24),
+}
+
+
+class QueueAnalytics:
+    """Downsampled time series of queue activity, kept in the shared store.
+
+    Each event is added to the second, minute and hour series at once, so
+    coarser history needs no separate rollup pass. Buckets are grouped into
+    store items (a minute of seconds, an hour of minutes, a day of hours)
+    with one attribute per field and bucket, e.g. joins_12; the store adds
+    counters atomically, so every instance writes into the same buckets.
+    Items expire once their buckets fall out of the retention window.
+
+    Events are written before the request returns, since an idle Lambda
+    instance may never run again to write anything it held back. Wait time
+    runs from the join time stored with each guest in the queue state to
+    their scan (or advance).
+    """
+
+    def __init__(self, store, app_id: str, archive_store=None):
+        self._store = store
+        self._app_id = app_id
+        self._archive_store = archive_store
+
+    @classmethod
+    def from_env(cls, store, app_id: str) -> "QueueAnalytics":
+        """Archive to ANALYTICS_ARCHIVE_BUCKET or ANALYTICS_ARCHIVE_DIR, if set"""
+        bucket_name = os.getenv("ANALYTICS_ARCHIVE_BUCKET")
+        directory = os.getenv("ANALYTICS_ARCHIVE_DIR")
+        if bucket_name:
+            return cls(store, app_id, S3ArchiveStore(bucket_name))
+        if directory:
+            return cls(store, app_id, LocalArchiveStore(directory))
+        return cls(store, app_id)
+
+    def record(
+        self,
+        event: Optional[str],
+        gauges: Dict[str, float],
+        count: int = 0,
+        joined_at: Sequence[float] = (),
+    ):
+        """Record count "join", "scan", "advance" or "leave" events, or None
+        to update the gauges only. joined_at holds the join times of the
+        guests who were scanned or advanced (0 where unknown)."""
+        now = time.time()
+        counters: Dict[str, float] = {}
+        maxima: Dict[str, float] = {}
+        if event == "join":
+            counters["joins"] = count
+        elif event in ("scan", "advance"):
+            counters[f"{event}s"] = count
+            waits = [now - joined for joined in joined_at if joined > 0]
+            if waits:
+                counters["wait_count"] = len(waits)
+                counters["wait_sum"] = sum(waits)
+                maxima["wait_max"] = max(waits)
+
+        for name, (seconds, capacity, per_item) in RESOLUTIONS.items():
+            bucket_id = int(now // seconds)
+            item_id, slot = divmod(bucket_id, per_item)
+            expires_at = int((item_id + 1) * per_item * seconds + capacity * seconds)
+            self._store.add_to_analytics(
+                self._app_id,
+                f"{name}#{item_id}",
+                {f"{field}_{slot}": value for field, value in counters.items()},
+                {f"{field}_{slot}": value for field, value in gauges.items()},
+                {f"{field}_{slot}": value for field, value in maxima.items()},
+                expires_at,
+            )
+
+    def query(
+        self, start: float, end: float, resolution: Optional[str] = None
+    ) -> Dict[str, Any]:
+        if resolution is None:
+            resolution = self._pick_resolution(start, end)
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution!r}")
+        seconds, capacity, per_item = RESOLUTIONS[resolution]
+
+        first = max(int(start // seconds), int(end // seconds) - capacity + 1)
+        last = int(end // seconds)
+        items = self._store.load_analytics(
+            self._app_id,
+            [
+                f"{resolution}#{item_id}"
+                for item_id in range(first // per_item, last // per_item + 1)
+            ],
+        )
+        series: Dict[str, List[float]] = {"timestamps": []}
+        series.update({field: [] for field in FIELDS})
+        for bucket_id in range(first, last + 1):
+            item = items.get(f"{resolution}#{bucket_id // per_item}")
+            slot = bucket_id % per_item
+            # Every recorded event sets the gauges, so they mark live buckets
+            if item is None or f"queue_length_{slot}" not in item:
+                continue
+            series["timestamps"].append(bucket_id * seconds)
+            for field in FIELDS:
+                series[field].append(item.get(f"{field}_{slot}", 0.0))
+
+        # Derived per-second rates and mean wait make the series chartable as-is
+        for event, field in (("join", "joins"), ("scan", "scans"), ("advance", "advances")):
+            series[f"{event}_rate"] = [value / seconds for value in series[field]]
+        series["avg_wait"] = [
+            total / count if count else None
+            for total, count in zip(series["wait_sum"], series["wait_count"])
+        ]
+        return {"resolution": resolution, "bucket_seconds": seconds, **series}
+
+    def _pick_resolution(self, start: float, end: float, max_points: int = 1000) -> str:
+        """Finest resolution that still covers start and stays under max_points"""
+        now = time.time()
+        for name, (seconds, capacity, _) in RESOLUTIONS.items():
+            if now - start <= seconds * capacity and (end - start) / seconds <= max_points:
+                return name
+        return "hour"
+
+    def archive_day(self) -> Optional[str]:
+        """Archive the last day of minute buckets.
+
+        Called from the daily reset, so the archive is keyed by the date
+        the business day ended on. The series comes from the shared store,
+        so whichever instance runs the reset writes the same archive.
+        """
+        end = time.time()
+        day = datetime.fromtimestamp(end, timezone.utc).date()
+        series = self.query(end - 86400, end, "minute")
+        if not self._archive_store or not series["timestamps"]:
+            return None
+        key = f"analytics/{day.isoformat()}.dqa"
+        try:
+            self._archive_store.write(key, encode_archive(day, 60, series))
+            return key
+        except Exception as e:
+            print(f"Error archiving analytics for {day}: {e}")
+            return None
+
+    def load_archive(self, day: date) -> Optional[Dict[str, Any]]:
+        if not self._archive_store:
+            return None
+        data = self._archive_store.read(f"analytics/{day.isoformat()}.dqa")
+        return decode_archive(data) if data else None
+
+
+### columnar archive files
+
+ARCHIVE_MAGIC = b"DQA1"
+
+
+def encode_archive(day: date, bucket_seconds: int, series: Dict[str, List[float]]) -> bytes:
+    """Magic, header length (u32), JSON header, then each column back to back.
+
+    Timestamps are stored as int64, other columns as float64, all
+    little-endian, in the order listed in the header.
+    """
+    header = json.dumps(
+        {
+            "day": day.isoformat(),
+            "bucket_seconds": bucket_seconds,
+            "rows": len(series["timestamps"]),
+            "columns": ["timestamps"] + FIELDS,
+        }
+    ).encode("utf-8")
+    columns = [array("q", series["timestamps"])]
+    columns += [array("d", series[field]) for field in FIELDS]
+    if sys.byteorder != "little":
+        for column in columns:
+            column.byteswap()
+    return b"".join(
+        [ARCHIVE_MAGIC, struct.pack("<I", len(header)), header]
+        + [column.tobytes() for column in columns]
+    )
+
+
+def decode_archive(data: bytes) -> Dict[str, Any]:
+    if data[:4] != ARCHIVE_MAGIC:
+        raise ValueError("Not an analytics archive")
+    (header_length,) = struct.unpack_from("<I", data, 4)
+    offset = 8
+    header = json.loads(data[offset : offset + header_length])
+    offset += header_length
+    rows = header["rows"]
+    result: Dict[str, Any] = {
+        "day": header["day"],
+        "bucket_seconds": header["bucket_seconds"],
+    }
+    for name in header["columns"]:
+        column = array("q" if name == "timestamps" else "d")
+        column.frombytes(data[offset : offset + 8 * rows])
+        if sys.byteorder != "little":
+            column.byteswap()
+        offset += 8 * rows
+        result[name] = column.tolist()
+    return result
+
+
+class S3ArchiveStore:
+    def __init__(self, bucket_name: str):
+        import boto3  # type: ignore
+
+        self._bucket_name = bucket_name
+        self._s3 = boto3.client("s3")
+
+    def write(self, key: str, body: bytes) -> None:
+        self._s3.put_object(
+            Bucket=self._bucket_name,
+            Key=key,
+            Body=body,
+            ContentType="application/octet-stream",
+        )
+
+    def read(self, key: str) -> Optional[bytes]:
+        try:
+            response = self._s3.get_object(Bucket=self._bucket_name, Key=key)
+            return response["Body"].read()
+        except self._s3.exceptions.NoSuchKey:
+            return None
+
+
+class LocalArchiveStore:
+    def __init__(self, directory: str):
+        self._directory = directory
+
+    def write(self, key: str, body: bytes) -> None:
+        path = os.path.join(self._directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(body)
+
+    def read(self, key: str) -> Optional[bytes]:
+        path = os.path.join(self._directory, key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
@@ -0,0 +1,86 @@
+"""Compare memory and request cost of GuestQueue with the old list of dicts.
+
+A request is one mutation followed by a save. GuestQueue's save is just a
+snapshot, but the next mutation then pays for the copy-on-write copy, so
+both are timed together.
+
+    python bench_guest_store.py [guest_count]
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+
+from guest_store import GuestQueue
+
+
+def build_dict_queue(count: int):
+    # Emails are built per guest, as they would be when parsed from requests
+    return [
+        {"email": f"guest{i}@example.com", "premium": i % 10 == 0}
+        for i in range(count)
+    ]
+
+
+def build_guest_queue(count: int):
+    queue = GuestQueue()
+    for i in range(count):
+        queue.append(f"guest{i}@example.com", i % 10 == 0)
+    return queue
+
+
+def measure_memory(build, count: int) -> int:
+    tracemalloc.start()
+    result = build(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def time_requests(mutate, save, repeats: int = 20) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        mutate()
+        save()
+    return (time.perf_counter() - started) / repeats * 1000
+
+
+def mutate_dict_queue(queue):
+    # Join then leave, so the queue keeps its size across repeats
+    queue.append({"email": "joiner@example.com", "premium": False})
+    queue.pop()
+
+
+def mutate_guest_queue(queue):
+    queue.append("joiner@example.com")
+    queue.pop()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    dict_bytes = measure_memory(build_dict_queue, count)
+    store_bytes = measure_memory(build_guest_queue, count)
+
+    dict_queue = build_dict_queue(count)
+    guest_queue = build_guest_queue(count)
+    # Old InMemoryPersistence deep copy vs the current snapshot-based save
+    dict_ms = time_requests(
+        lambda: mutate_dict_queue(dict_queue),
+        lambda: json.loads(json.dumps({"queue": dict_queue})),
+    )
+    store_ms = time_requests(
+        lambda: mutate_guest_queue(guest_queue),
+        lambda: dict({"queue": guest_queue.snapshot()}),
+    )
+
+    print(f"guests: {count}")
+    print(f"{'':<16}{'memory (MB)':>14}{'mutate+save (ms)':>19}")
+    print(f"{'list of dicts':<16}{dict_bytes / 1e6:>14.2f}{dict_ms:>19.3f}")
+    print(f"{'GuestQueue':<16}{store_bytes / 1e6:>14.2f}{store_ms:>19.3f}")
+
+
+if __name__ == "__main__":
+    main()
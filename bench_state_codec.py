@@ -0,0 +1,53 @@
+"""Compare encode/decode cost and stored size of the state codecs.
+
+    python bench_state_codec.py [guest_count]
+"""
+
+import sys
+import time
+
+from guest_store import GuestQueue
+from persistence import CODECS
+
+
+def build_state(count: int):
+    queue = GuestQueue()
+    for i in range(count):
+        queue.append(f"guest{i}@example.com", i % 10 == 0)
+    return {
+        "queue": queue.snapshot(),
+        "is_open": True,
+        "premium_limit": 3,
+        "one_shot_price": 5,
+        "premium_access_enabled": False,
+        "venue_mode_enabled": False,
+        "venue_capacity": 0,
+        "guests_in_venue": 0,
+        "ready_pool_limit": 0,
+        "mock_guest_counter": 0,
+        "version": 1,
+    }
+
+
+def time_ms(func, repeats: int = 10) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - started) / repeats * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    state = build_state(count)
+
+    print(f"guests: {count}")
+    print(f"{'codec':<10}{'bytes':>12}{'encode (ms)':>14}{'decode (ms)':>14}")
+    for codec in CODECS.values():
+        data = codec.encode(state)
+        encode_ms = time_ms(lambda: codec.encode(state))
+        decode_ms = time_ms(lambda: codec.decode(data))
+        print(f"{codec.name:<10}{len(data):>12}{encode_ms:>14.2f}{decode_ms:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
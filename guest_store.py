@@ -0,0 +1,184 @@
+import sys
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class _GuestView:
+    """Read helpers shared by GuestQueue and its snapshots"""
+
+    __slots__ = ()
+
+    def __len__(self) -> int:
+        return len(self._emails)
+
+    def to_list(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        bits = self._premium_bits
+        emails = self._emails[start:stop]
+        tickets = self._tickets[start:stop]
+        joined = self._joined[start:stop]
+        return [
+            {
+                "email": email,
+                "premium": bool(bits >> (start + i) & 1),
+                "ticket": tickets[i],
+                "joined_at": joined[i],
+            }
+            for i, email in enumerate(emails)
+        ]
+
+    def iter_guests(self) -> Iterable[Tuple[str, bool]]:
+        bits = self._premium_bits
+        for email in self._emails:
+            yield email, bool(bits & 1)
+            bits >>= 1
+
+    def premium_count(self, start: int = 0) -> int:
+        return bin(self._premium_bits >> start).count("1")
+
+
+class GuestSnapshot(_GuestView):
+    """Read-only view of a GuestQueue at the moment snapshot() was called.
+
+    Shares the email list with the queue it came from; the queue copies the
+    list before its next mutation, so taking a snapshot costs nothing.
+    """
+
+    __slots__ = ("_emails", "_premium_bits", "_tickets", "_joined")
+
+    def __init__(
+        self, emails: List[str], premium_bits: int, tickets: array, joined: array
+    ):
+        self._emails = emails
+        self._premium_bits = premium_bits
+        self._tickets = tickets
+        self._joined = joined
+
+
+class GuestQueue(_GuestView):
+    """Ordered guests stored as parallel arrays.
+
+    Emails are interned and kept in a plain list; premium flags are packed
+    into the bits of a single int (bit i is the guest at position i); each
+    guest's ticket (see tickets.py) sits in a packed int64 array and their
+    join time (epoch seconds, 0 if unknown) in a packed float64 array.
+    """
+
+    __slots__ = ("_emails", "_premium_bits", "_tickets", "_joined", "_shared")
+
+    def __init__(self):
+        self._emails: List[str] = []
+        self._premium_bits = 0
+        self._tickets = array("q")
+        self._joined = array("d")
+        self._shared = False
+
+    @classmethod
+    def from_state(cls, guests: Any) -> "GuestQueue":
+        """Build from a snapshot or the persisted list of guest dicts"""
+        store = cls()
+        if isinstance(guests, GuestSnapshot):
+            store._emails = guests._emails
+            store._premium_bits = guests._premium_bits
+            store._tickets = guests._tickets
+            store._joined = guests._joined
+            store._shared = True
+            return store
+        for guest in guests or []:
+            store.append(
+                guest["email"],
+                guest.get("premium", False),
+                guest.get("ticket", -1),
+                guest.get("joined_at", 0.0),
+            )
+        return store
+
+    def snapshot(self) -> GuestSnapshot:
+        self._shared = True
+        return GuestSnapshot(
+            self._emails, self._premium_bits, self._tickets, self._joined
+        )
+
+    def _own(self):
+        # Copy-on-write: detach from any outstanding snapshot before mutating
+        if self._shared:
+            self._emails = list(self._emails)
+            self._tickets = array("q", self._tickets)
+            self._joined = array("d", self._joined)
+            self._shared = False
+
+    ### reads
+
+    def __bool__(self) -> bool:
+        return bool(self._emails)
+
+    def __contains__(self, email: str) -> bool:
+        return email in self._emails
+
+    def index(self, email: str) -> int:
+        """Position of email, or -1 if the guest is not queued"""
+        try:
+            return self._emails.index(email)
+        except ValueError:
+            return -1
+
+    def email_at(self, index: int) -> str:
+        return self._emails[index]
+
+    def ticket_at(self, index: int) -> int:
+        return self._tickets[index]
+
+    def is_premium_at(self, index: int) -> bool:
+        return bool(self._premium_bits >> index & 1)
+
+    ### writes
+
+    def append(
+        self,
+        email: str,
+        premium: bool = False,
+        ticket: int = -1,
+        joined_at: float = 0.0,
+    ):
+        self._own()
+        if premium:
+            self._premium_bits |= 1 << len(self._emails)
+        self._emails.append(sys.intern(email))
+        self._tickets.append(ticket)
+        self._joined.append(joined_at)
+
+    def insert(
+        self,
+        index: int,
+        email: str,
+        premium: bool = False,
+        ticket: int = -1,
+        joined_at: float = 0.0,
+    ):
+        self._own()
+        index = max(0, min(index, len(self._emails)))
+        low = self._premium_bits & ((1 << index) - 1)
+        high = self._premium_bits >> index
+        self._premium_bits = low | (int(premium) << index) | (high << (index + 1))
+        self._emails.insert(index, sys.intern(email))
+        self._tickets.insert(index, ticket)
+        self._joined.insert(index, joined_at)
+
+    def pop(self, index: int = 0) -> Tuple[str, bool, int, float]:
+        self._own()
+        if index < 0:
+            index += len(self._emails)
+        email = self._emails.pop(index)
+        ticket = self._tickets.pop(index)
+        joined_at = self._joined.pop(index)
+        premium = bool(self._premium_bits >> index & 1)
+        low = self._premium_bits & ((1 << index) - 1)
+        high = self._premium_bits >> (index + 1)
+        self._premium_bits = low | (high << index)
+        return email, premium, ticket, joined_at
+
+    def clear(self):
+        self._emails = []
+        self._premium_bits = 0
+        self._tickets = array("q")
+        self._joined = array("d")
+        self._shared = False
@@ -0,0 +1,206 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyMiddleware:
+    """Replay the stored response for retried mutating requests.
+
+    A request carrying an Idempotency-Key header is claimed in the
+    persistence store before it reaches the route, so a retry landing on
+    any instance gets the original response instead of running again. Keys
+    are scoped to method and path and tied to a hash of the body, so
+    reusing a key for a different payload is rejected with 422. A pending
+    claim is only leased for lease_seconds (about the function timeout),
+    after which a retry may take it over if the first attempt died.
+    Completed responses are also kept in a small local TTL cache so repeat
+    retries skip the store entirely. 5xx responses are not stored, letting
+    the client retry for real.
+    """
+
+    def __init__(
+        self,
+        app,
+        store,
+        app_id: str,
+        ttl_seconds: int = 24 * 60 * 60,
+        lease_seconds: int = 20,
+        max_entries: int = 1000,
+    ):
+        self.app = app
+        self._store = store
+        self._app_id = app_id
+        self._ttl_seconds = ttl_seconds
+        self._lease_seconds = lease_seconds
+        self._max_entries = max_entries
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        header = dict(scope.get("headers") or []).get(IDEMPOTENCY_HEADER)
+        if header is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = header.decode("latin-1").strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await self._send_json(
+                send,
+                400,
+                {"detail": f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters."},
+            )
+            return
+
+        # Buffer the body so it can be hashed before the route consumes it
+        body = await self._read_body(receive)
+        body_hash = hashlib.sha256(body).hexdigest()
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        request_key = f"{scope['method']} {scope['path']} {key}"
+        cached = self._get_cached(request_key)
+        if cached is not None:
+            if cached["body_hash"] != body_hash:
+                await self._send_mismatch(send)
+                return
+            await self._send_stored(send, cached["response"])
+            return
+
+        record = self._store.claim_request(
+            self._app_id, request_key, body_hash, self._lease_seconds
+        )
+        if record is not None:
+            if record.get("body_hash") not in (None, body_hash):
+                await self._send_mismatch(send)
+                return
+            if record.get("pending"):
+                await self._send_json(
+                    send,
+                    409,
+                    {"detail": "A request with this Idempotency-Key is in progress."},
+                )
+                return
+            self._put_cached(request_key, body_hash, record["response"])
+            await self._send_stored(send, record["response"])
+            return
+
+        response: Dict[str, Any] = {"body": b""}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status_code"] = message["status"]
+                response["content_type"] = (
+                    dict(message.get("headers") or [])
+                    .get(b"content-type", b"application/json")
+                    .decode("latin-1")
+                )
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except Exception:
+            self._store.release_request(self._app_id, request_key)
+            raise
+
+        if response.get("status_code", 500) >= 500:
+            self._store.release_request(self._app_id, request_key)
+            return
+
+        stored = {
+            "status_code": response["status_code"],
+            "content_type": response["content_type"],
+            "body": response["body"].decode("utf-8", errors="replace"),
+        }
+        self._store.complete_request(
+            self._app_id, request_key, body_hash, stored, self._ttl_seconds
+        )
+        self._put_cached(request_key, body_hash, stored)
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    def _get_cached(self, request_key: str) -> Optional[Dict[str, Any]]:
+        with self._cache_lock:
+            entry = self._cache.get(request_key)
+            if entry is None:
+                return None
+            if entry["expires_at"] <= time.time():
+                del self._cache[request_key]
+                return None
+            return entry
+
+    def _put_cached(
+        self, request_key: str, body_hash: str, response: Dict[str, Any]
+    ):
+        with self._cache_lock:
+            self._cache[request_key] = {
+                "body_hash": body_hash,
+                "response": response,
+                "expires_at": time.time() + self._ttl_seconds,
+            }
+            self._cache.move_to_end(request_key)
+            while len(self._cache) > self._max_entries:
+                self._cache.popitem(last=False)
+
+    async def _send_stored(self, send, stored: Dict[str, Any]):
+        await self._send(
+            send,
+            stored["status_code"],
+            stored["body"].encode("utf-8"),
+            stored["content_type"],
+            replayed=True,
+        )
+
+    async def _send_mismatch(self, send):
+        await self._send_json(
+            send,
+            422,
+            {"detail": "Idempotency-Key was already used with a different request."},
+        )
+
+    async def _send_json(self, send, status_code: int, content: Dict[str, Any]):
+        await self._send(
+            send, status_code, json.dumps(content).encode("utf-8"), "application/json"
+        )
+
+    async def _send(
+        self, send, status_code: int, body: bytes, content_type: str, replayed=False
+    ):
+        headers = [
+            (b"content-type", content_type.encode("latin-1")),
+            (b"content-length", str(len(body)).encode("latin-1")),
+        ]
+        if replayed:
+            headers.append((b"idempotent-replayed", b"true"))
+        await send(
+            {"type": "http.response.start", "status": status_code, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": body})
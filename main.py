@@ -11,11 +11,19 @@ from mangum import Mangum
 
 # my modules
 # from queue_controller import QueueController
+from idempotency import IdempotencyMiddleware
+from profiling import ProfiledRoute
 from queue_instance import queue
+from request_capture import RequestCaptureMiddleware
 from routes import router
 
 
 app = FastAPI(title="Virtual Queue System")
+# Route handlers can be profiled on demand from the admin panel
+app.router.route_class = ProfiledRoute
+
+# Retried mutating requests with an Idempotency-Key get the original response
+app.add_middleware(IdempotencyMiddleware, store=queue._store, app_id=queue._app_id)
 
 # CORS for S3/CloudFront-hosted frontends
 cors_origins_env = os.getenv("CORS_ORIGINS", "*")
@@ -28,6 +36,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in traffic capture for offline replay (see replay.py)
+capture_path = os.getenv("REQUEST_CAPTURE_PATH")
+if capture_path:
+    app.add_middleware(RequestCaptureMiddleware, path=capture_path)
+
 # Create an instance of the controller
 # queue = QueueController()
 
@@ -99,7 +112,7 @@ async def join_premium(request: Request):
     if not email:
         raise HTTPException(status_code=400, detail="Email is required.")
     queue.join_premium_queue(email)
-    return {"message": "Premium join successful"}
+    return {"message": "Premium join successful", "ticket": queue.get_ticket(email)}
 
 
 @app.post("/set-ready-pool-limit")
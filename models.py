@@ -1,8 +1,10 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 
 class Guest(BaseModel):
-    email: str  # Using str instead of EmailStr for better compatibility
+    # Using str instead of EmailStr for better compatibility; 254 is the
+    # longest valid address and keeps every stored email length small
+    email: str = Field(..., min_length=1, max_length=254)
 
 
 class QueueStatus(BaseModel):
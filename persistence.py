@@ -1,25 +1,433 @@
 import json
 import os
-from typing import Optional, Dict, Any
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Optional, Dict, Any, List
 from datetime import datetime, timezone
 
+from guest_store import GuestQueue, GuestSnapshot
+from tickets import TicketBook
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, GuestSnapshot):
+        return obj.to_list()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+STATE_SCHEMA_VERSION = 4
+
+
+class StateDecodeError(ValueError):
+    pass
+
+
+def _migrate_v1(state: Dict[str, Any]) -> Dict[str, Any]:
+    """v1 is the original JSON blob, written before fields had defaults"""
+    return {
+        "premium_access_enabled": False,
+        "mock_guest_counter": 0,
+        "version": 0,
+        **state,
+    }
+
+
+def _migrate_v2(state: Dict[str, Any]) -> Dict[str, Any]:
+    """v2 predates tickets; issue them in current queue order"""
+    guests = state["queue"]
+    book, tickets = TicketBook.rebuild(premium for _, premium in guests.iter_guests())
+    book.ready_pool_limit = state.get("ready_pool_limit", 0)
+    return {
+        **state,
+        "queue": GuestSnapshot(
+            guests._emails, guests._premium_bits, array("q", tickets), guests._joined
+        ),
+        "tickets": book.to_dict(),
+    }
+
+
+def _migrate_v3(state: Dict[str, Any]) -> Dict[str, Any]:
+    """v3 predates join times; decoding already filled them with 0 (unknown)"""
+    return state
+
+
+# Each migration upgrades a decoded state from its version to the next one
+MIGRATIONS = {1: _migrate_v1, 2: _migrate_v2, 3: _migrate_v3}
+
+
+def _validate_state(state: Dict[str, Any]) -> bool:
+    """Validate that the state has the expected structure"""
+    required_keys = [
+        "queue",
+        "is_open",
+        "premium_limit",
+        "one_shot_price",
+        "venue_mode_enabled",
+        "venue_capacity",
+        "guests_in_venue",
+        "ready_pool_limit",
+    ]
+
+    # Check all required keys exist
+    if not all(key in state for key in required_keys):
+        return False
+
+    # Validate queue is a snapshot of the guest queue
+    if not isinstance(state.get("queue"), GuestSnapshot):
+        return False
+
+    # Validate other fields have correct types
+    if not isinstance(state.get("is_open"), bool):
+        return False
+
+    if not isinstance(state.get("premium_limit"), int):
+        return False
+
+    if not isinstance(state.get("one_shot_price"), (int, float)):
+        return False
+
+    if not isinstance(state.get("venue_mode_enabled"), bool):
+        return False
+
+    if not isinstance(state.get("venue_capacity"), int):
+        return False
+
+    if not isinstance(state.get("guests_in_venue"), int):
+        return False
+
+    if not isinstance(state.get("ready_pool_limit"), int):
+        return False
+
+    return True
+
+
+def _finish_decode(state: Dict[str, Any], schema_version: int) -> Dict[str, Any]:
+    """Migrate to the current schema and validate; the one check per load"""
+    if schema_version > STATE_SCHEMA_VERSION:
+        raise StateDecodeError(f"Unsupported state schema version {schema_version}")
+    while schema_version < STATE_SCHEMA_VERSION:
+        state = MIGRATIONS[schema_version](state)
+        schema_version += 1
+    if not _validate_state(state):
+        raise StateDecodeError("State does not match the expected structure")
+    return state
+
+
+class JsonStateCodec:
+    """Human-readable JSON; states without schema_version are treated as v1"""
+
+    name = "json"
+
+    def encode(self, state: Dict[str, Any]) -> bytes:
+        return json.dumps(
+            {**state, "schema_version": STATE_SCHEMA_VERSION}, default=_json_default
+        ).encode("utf-8")
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        state = json.loads(data)
+        if not isinstance(state, dict):
+            raise StateDecodeError("State must be a JSON object")
+        schema_version = state.pop("schema_version", 1)
+
+        guests = state.get("queue")
+        if not isinstance(guests, list):
+            raise StateDecodeError("Queue must be a list")
+        emails = []
+        premium_bits = 0
+        tickets = array("q")
+        joined = array("d")
+        for index, guest in enumerate(guests):
+            if not isinstance(guest, dict) or not isinstance(guest.get("email"), str):
+                raise StateDecodeError("Queue entries must have an email")
+            emails.append(sys.intern(guest["email"]))
+            if guest.get("premium"):
+                premium_bits |= 1 << index
+            tickets.append(guest.get("ticket", -1))
+            joined.append(guest.get("joined_at", 0.0))
+        state["queue"] = GuestSnapshot(emails, premium_bits, tickets, joined)
+
+        return _finish_decode(state, schema_version)
+
+
+class BinaryStateCodec:
+    """Compact encoding: a JSON header for settings plus a packed guest table.
+
+    Layout (little-endian): magic, schema version (u16), header length (u32),
+    header JSON, guest count (u32), email lengths (u16 each), premium bitmap
+    (ceil(count / 8) bytes), tickets (i64 each, from v3), join times (f64
+    each, from v4), then all emails concatenated as UTF-8.
+    """
+
+    name = "binary"
+    MAGIC = b"DQS"
+
+    def encode(self, state: Dict[str, Any]) -> bytes:
+        guests = state["queue"]
+        if not isinstance(guests, GuestSnapshot):
+            guests = GuestQueue.from_state(guests).snapshot()
+        emails = guests._emails
+        header = json.dumps({k: v for k, v in state.items() if k != "queue"}).encode(
+            "utf-8"
+        )
+        try:
+            lengths = array("H", map(len, emails))
+        except OverflowError:
+            raise ValueError(
+                "Email longer than 65535 characters cannot be stored"
+            ) from None
+        tickets = array("q", guests._tickets)
+        joined = array("d", guests._joined)
+        if sys.byteorder != "little":
+            lengths.byteswap()
+            tickets.byteswap()
+            joined.byteswap()
+        return b"".join(
+            [
+                self.MAGIC,
+                struct.pack("<HI", STATE_SCHEMA_VERSION, len(header)),
+                header,
+                struct.pack("<I", len(emails)),
+                lengths.tobytes(),
+                guests._premium_bits.to_bytes((len(emails) + 7) // 8, "little"),
+                tickets.tobytes(),
+                joined.tobytes(),
+                "".join(emails).encode("utf-8"),
+            ]
+        )
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        try:
+            if data[:3] != self.MAGIC:
+                raise StateDecodeError("Not a binary queue state")
+            schema_version, header_length = struct.unpack_from("<HI", data, 3)
+            offset = 9
+            state = json.loads(data[offset : offset + header_length])
+            offset += header_length
+
+            (count,) = struct.unpack_from("<I", data, offset)
+            offset += 4
+            lengths = array("H")
+            lengths.frombytes(data[offset : offset + 2 * count])
+            if sys.byteorder != "little":
+                lengths.byteswap()
+            offset += 2 * count
+            bitmap_length = (count + 7) // 8
+            premium_bits = int.from_bytes(data[offset : offset + bitmap_length], "little")
+            offset += bitmap_length
+            tickets = array("q")
+            if schema_version >= 3:
+                tickets.frombytes(data[offset : offset + 8 * count])
+                if sys.byteorder != "little":
+                    tickets.byteswap()
+                offset += 8 * count
+            else:
+                tickets.extend([-1] * count)
+            joined_at = array("d")
+            if schema_version >= 4:
+                joined_at.frombytes(data[offset : offset + 8 * count])
+                if sys.byteorder != "little":
+                    joined_at.byteswap()
+                offset += 8 * count
+            else:
+                joined_at.extend([0.0] * count)
+            joined = bytes(data[offset:]).decode("utf-8")
+        except (struct.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise StateDecodeError(f"Corrupt binary state: {e}") from e
+
+        if (
+            len(lengths) != count
+            or len(tickets) != count
+            or len(joined_at) != count
+            or sum(lengths) != len(joined)
+        ):
+            raise StateDecodeError("Corrupt binary state: guest table mismatch")
+        emails = []
+        position = 0
+        for length in lengths:
+            emails.append(sys.intern(joined[position : position + length]))
+            position += length
+        state["queue"] = GuestSnapshot(emails, premium_bits, tickets, joined_at)
+
+        return _finish_decode(state, schema_version)
+
+
+CODECS = {codec.name: codec for codec in (JsonStateCodec(), BinaryStateCodec())}
+
+
+def get_codec(name: str):
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown state codec {name!r}") from None
+
 
 class InMemoryPersistence:
-    def __init__(self):
+    def __init__(self, codec=None):
+        # No codec by default: the state is kept as-is, queue snapshot and all
+        self._codec = codec
         self._state: Optional[Dict[str, Any]] = None
+        self._encoded_state: Optional[bytes] = None
+        self._position_index: Optional[Dict[str, Any]] = None
+        self._counters: Dict[str, int] = {}
+        self._counter_lock = threading.Lock()
+        self._requests: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._requests_lock = threading.Lock()
+        self._max_requests = 10000
+        self._analytics: Dict[str, Dict[str, float]] = {}
+        self._analytics_lock = threading.Lock()
 
     def load_state(self, app_id: str) -> Optional[Dict[str, Any]]:
+        if self._codec and self._encoded_state is not None:
+            return self._codec.decode(self._encoded_state)
         return self._state
 
     def save_state(self, app_id: str, state: Dict[str, Any]) -> None:
-        # Deep copy to prevent reference issues
-        self._state = json.loads(json.dumps(state))
+        if self._codec:
+            self._encoded_state = self._codec.encode(state)
+            return
+        # Shallow copy is enough: the queue arrives as an immutable snapshot
+        self._state = dict(state)
+
+    def load_position_index(self, app_id: str) -> Optional[Dict[str, Any]]:
+        return self._position_index
+
+    def save_position_index(self, app_id: str, index: Dict[str, Any]) -> None:
+        self._position_index = index
+
+    def get_counter(self, app_id: str, name: str) -> Optional[int]:
+        return self._counters.get(f"{app_id}#{name}")
+
+    def set_counter(self, app_id: str, name: str, value: int) -> None:
+        with self._counter_lock:
+            self._counters[f"{app_id}#{name}"] = value
+
+    def seed_counter(self, app_id: str, name: str, value: int) -> int:
+        """Create the counter at value unless it exists; returns the current value"""
+        with self._counter_lock:
+            return self._counters.setdefault(f"{app_id}#{name}", value)
+
+    def add_to_counter(
+        self,
+        app_id: str,
+        name: str,
+        delta: int,
+        max_value: Optional[int] = None,
+        min_value: Optional[int] = None,
+    ) -> Optional[int]:
+        """Atomically add delta; returns the new value, or None if a bound would be crossed"""
+        key = f"{app_id}#{name}"
+        with self._counter_lock:
+            new_value = self._counters.get(key, 0) + delta
+            if max_value is not None and new_value > max_value:
+                return None
+            if min_value is not None and new_value < min_value:
+                return None
+            self._counters[key] = new_value
+            return new_value
+
+    def raise_counter(self, app_id: str, name: str, value: int) -> bool:
+        """Set the counter to value only if that raises it; returns whether it did"""
+        key = f"{app_id}#{name}"
+        with self._counter_lock:
+            current = self._counters.get(key)
+            if current is not None and current >= value:
+                return False
+            self._counters[key] = value
+            return True
+
+    def claim_request(
+        self, app_id: str, key: str, body_hash: str, lease_seconds: int
+    ) -> Optional[Dict[str, Any]]:
+        """Reserve an idempotency key; returns None if claimed, else the existing record.
+
+        A pending claim expires after lease_seconds so a crashed request
+        does not hold the key for the full record TTL.
+        """
+        record_key = f"{app_id}#{key}"
+        now = time.time()
+        with self._requests_lock:
+            record = self._requests.get(record_key)
+            if record and record["expires_at"] > now:
+                return record
+            self._requests[record_key] = {
+                "pending": True,
+                "body_hash": body_hash,
+                "expires_at": now + lease_seconds,
+            }
+            self._requests.move_to_end(record_key)
+            while len(self._requests) > self._max_requests:
+                self._requests.popitem(last=False)
+            return None
+
+    def complete_request(
+        self,
+        app_id: str,
+        key: str,
+        body_hash: str,
+        response: Dict[str, Any],
+        ttl_seconds: int,
+    ) -> None:
+        with self._requests_lock:
+            self._requests[f"{app_id}#{key}"] = {
+                "pending": False,
+                "body_hash": body_hash,
+                "response": response,
+                "expires_at": time.time() + ttl_seconds,
+            }
+
+    def release_request(self, app_id: str, key: str) -> None:
+        with self._requests_lock:
+            self._requests.pop(f"{app_id}#{key}", None)
+
+    def add_to_analytics(
+        self,
+        app_id: str,
+        item_key: str,
+        counters: Dict[str, float],
+        gauges: Dict[str, float],
+        maxima: Dict[str, float],
+        expires_at: int,
+    ) -> None:
+        """Add counters, overwrite gauges and raise maxima on one analytics item"""
+        key = f"{app_id}#{item_key}"
+        with self._analytics_lock:
+            item = self._analytics.get(key)
+            if item is None:
+                # New items are rare (one per bucket group), so sweep then
+                now = time.time()
+                for stale in [
+                    k for k, v in self._analytics.items() if v["expires_at"] < now
+                ]:
+                    del self._analytics[stale]
+                item = self._analytics[key] = {}
+            for name, value in counters.items():
+                item[name] = item.get(name, 0) + value
+            item.update(gauges)
+            for name, value in maxima.items():
+                item[name] = max(item.get(name, value), value)
+            item["expires_at"] = expires_at
+
+    def load_analytics(
+        self, app_id: str, item_keys: List[str]
+    ) -> Dict[str, Dict[str, float]]:
+        with self._analytics_lock:
+            return {
+                key: dict(self._analytics[f"{app_id}#{key}"])
+                for key in item_keys
+                if f"{app_id}#{key}" in self._analytics
+            }
 
 
 class DynamoDBPersistence:
-    def __init__(self, table_name: str):
+    def __init__(self, table_name: str, codec=None):
         import boto3  # type: ignore
 
+        self._codec = codec or CODECS["json"]
         self._table_name = table_name
         self._ddb = boto3.resource("dynamodb")
         self._table = self._ddb.Table(table_name)
@@ -31,33 +439,41 @@ class DynamoDBPersistence:
             if not item:
                 return None
 
-            state_json = item.get("state_json", "{}")
-            if not state_json:
+            # Decode with whichever codec wrote the item, so switching codecs
+            # keeps existing state readable
+            if "state_blob" in item:
+                codec = get_codec(item.get("codec", BinaryStateCodec.name))
+                data = bytes(item["state_blob"])
+            else:
+                codec = CODECS["json"]
+                data = item.get("state_json", "").encode("utf-8")
+            if not data:
                 return None
 
-            state = json.loads(state_json)
-
-            # Validate state structure
-            if not self._validate_state(state):
-                print(f"Warning: Invalid state loaded for {app_id}, using defaults")
+            try:
+                return codec.decode(data)
+            except StateDecodeError as e:
+                print(f"Warning: Invalid state loaded for {app_id}, using defaults: {e}")
                 return None
 
-            return state
-
         except Exception as e:
             print(f"Error loading state for {app_id}: {e}")
             return None
 
     def save_state(self, app_id: str, state: Dict[str, Any]) -> None:
         try:
-            # Validate state before saving
-            if not self._validate_state(state):
-                print(f"Warning: Invalid state not saved for {app_id}")
-                return
+            # State comes straight from the controller, so it is only
+            # validated when decoded
+            data = self._codec.encode(state)
+            if self._codec.name == JsonStateCodec.name:
+                encoded = {"state_json": data.decode("utf-8")}
+            else:
+                encoded = {"state_blob": data}
 
             # Add metadata for debugging
             state_with_metadata = {
-                "state_json": json.dumps(state),
+                **encoded,
+                "codec": self._codec.name,
                 "last_updated": datetime.now(timezone.utc).isoformat(),
                 "app_id": app_id,
             }
@@ -67,49 +483,317 @@ class DynamoDBPersistence:
             )
 
         except Exception as e:
+            # Raised so the controller can roll back rather than silently
+            # drift from what is stored
             print(f"Error saving state for {app_id}: {e}")
+            raise
 
-    def _validate_state(self, state: Dict[str, Any]) -> bool:
-        """Validate that the state has the expected structure"""
-        required_keys = [
-            "queue",
-            "is_open",
-            "premium_limit",
-            "one_shot_price",
-            "venue_mode_enabled",
-            "venue_capacity",
-            "guests_in_venue",
-            "ready_pool_limit",
-        ]
-
-        # Check all required keys exist
-        if not all(key in state for key in required_keys):
-            return False
+    def load_position_index(self, app_id: str) -> Optional[Dict[str, Any]]:
+        """The small ticket item guests poll, read without the queue state"""
+        try:
+            response = self._table.get_item(Key={"pk": f"positions#{app_id}"})
+            item = response.get("Item")
+            if not item or not item.get("index_json"):
+                return None
+            return json.loads(item["index_json"])
 
-        # Validate queue is a list
-        if not isinstance(state.get("queue"), list):
-            return False
+        except Exception as e:
+            print(f"Error loading position index for {app_id}: {e}")
+            return None
 
-        # Validate other fields have correct types
-        if not isinstance(state.get("is_open"), bool):
-            return False
+    def save_position_index(self, app_id: str, index: Dict[str, Any]) -> None:
+        try:
+            self._table.put_item(
+                Item={
+                    "pk": f"positions#{app_id}",
+                    "index_json": json.dumps(index),
+                    "last_updated": datetime.now(timezone.utc).isoformat(),
+                    "app_id": app_id,
+                }
+            )
 
-        if not isinstance(state.get("premium_limit"), int):
-            return False
+        except Exception as e:
+            print(f"Error saving position index for {app_id}: {e}")
 
-        if not isinstance(state.get("one_shot_price"), (int, float)):
-            return False
+    def get_counter(self, app_id: str, name: str) -> Optional[int]:
+        try:
+            response = self._table.get_item(
+                Key={"pk": f"counter#{app_id}#{name}"}, ConsistentRead=True
+            )
+            item = response.get("Item")
+            if not item or "value" not in item:
+                return None
+            return int(item["value"])
 
-        if not isinstance(state.get("venue_mode_enabled"), bool):
-            return False
+        except Exception as e:
+            print(f"Error loading counter {name} for {app_id}: {e}")
+            return None
 
-        if not isinstance(state.get("venue_capacity"), int):
-            return False
+    def set_counter(self, app_id: str, name: str, value: int) -> None:
+        try:
+            self._table.put_item(
+                Item={
+                    "pk": f"counter#{app_id}#{name}",
+                    "value": value,
+                    "last_updated": datetime.now(timezone.utc).isoformat(),
+                    "app_id": app_id,
+                }
+            )
 
-        if not isinstance(state.get("guests_in_venue"), int):
-            return False
+        except Exception as e:
+            print(f"Error saving counter {name} for {app_id}: {e}")
+
+    def seed_counter(self, app_id: str, name: str, value: int) -> int:
+        """Create the counter at value unless it exists; returns the current value"""
+        from botocore.exceptions import ClientError  # type: ignore
+
+        try:
+            # Conditional so a concurrent ADD from another instance is never overwritten
+            self._table.put_item(
+                Item={
+                    "pk": f"counter#{app_id}#{name}",
+                    "value": value,
+                    "last_updated": datetime.now(timezone.utc).isoformat(),
+                    "app_id": app_id,
+                },
+                ConditionExpression="attribute_not_exists(pk)",
+            )
+            return value
+
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                print(f"Error seeding counter {name} for {app_id}: {e}")
+                return value
+        current = self.get_counter(app_id, name)
+        return value if current is None else current
+
+    def add_to_counter(
+        self,
+        app_id: str,
+        name: str,
+        delta: int,
+        max_value: Optional[int] = None,
+        min_value: Optional[int] = None,
+    ) -> Optional[int]:
+        """Atomically add delta; returns the new value, or None if a bound would be crossed"""
+        from botocore.exceptions import ClientError  # type: ignore
+
+        # ADD treats a missing attribute as 0, so bounds must allow for that too
+        conditions = []
+        values: Dict[str, Any] = {":delta": delta}
+        if max_value is not None:
+            if delta > max_value:
+                return None
+            conditions.append("(attribute_not_exists(#v) OR #v <= :upper)")
+            values[":upper"] = max_value - delta
+        if min_value is not None:
+            if delta < min_value:
+                conditions.append("#v >= :lower")
+            else:
+                conditions.append("(attribute_not_exists(#v) OR #v >= :lower)")
+            values[":lower"] = min_value - delta
+
+        update_kwargs: Dict[str, Any] = {
+            "Key": {"pk": f"counter#{app_id}#{name}"},
+            "UpdateExpression": "ADD #v :delta SET last_updated = :now",
+            "ExpressionAttributeNames": {"#v": "value"},
+            "ExpressionAttributeValues": {
+                **values,
+                ":now": datetime.now(timezone.utc).isoformat(),
+            },
+            "ReturnValues": "UPDATED_NEW",
+        }
+        if conditions:
+            update_kwargs["ConditionExpression"] = " AND ".join(conditions)
+
+        try:
+            response = self._table.update_item(**update_kwargs)
+            return int(response["Attributes"]["value"])
+
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return None
+            raise
 
-        if not isinstance(state.get("ready_pool_limit"), int):
+    def raise_counter(self, app_id: str, name: str, value: int) -> bool:
+        """Set the counter to value only if that raises it; returns whether it did"""
+        from botocore.exceptions import ClientError  # type: ignore
+
+        try:
+            self._table.update_item(
+                Key={"pk": f"counter#{app_id}#{name}"},
+                UpdateExpression="SET #v = :value, last_updated = :now",
+                ConditionExpression="attribute_not_exists(#v) OR #v < :value",
+                ExpressionAttributeNames={"#v": "value"},
+                ExpressionAttributeValues={
+                    ":value": value,
+                    ":now": datetime.now(timezone.utc).isoformat(),
+                },
+            )
+            return True
+
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                print(f"Error raising counter {name} for {app_id}: {e}")
             return False
 
-        return True
+    def claim_request(
+        self, app_id: str, key: str, body_hash: str, lease_seconds: int
+    ) -> Optional[Dict[str, Any]]:
+        """Reserve an idempotency key; returns None if claimed, else the existing record.
+
+        A pending claim expires after lease_seconds so a crashed request
+        does not hold the key for the full record TTL.
+        """
+        from botocore.exceptions import ClientError  # type: ignore
+
+        pk = f"request#{app_id}#{key}"
+        now = int(time.time())
+        try:
+            # expires_at doubles as the table's TTL attribute; expired items
+            # (and lapsed leases) may linger until DynamoDB sweeps them, so
+            # they can be reclaimed
+            self._table.put_item(
+                Item={
+                    "pk": pk,
+                    "pending": True,
+                    "body_hash": body_hash,
+                    "expires_at": now + lease_seconds,
+                    "app_id": app_id,
+                },
+                ConditionExpression="attribute_not_exists(pk) OR expires_at < :now",
+                ExpressionAttributeValues={":now": now},
+            )
+            return None
+
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                print(f"Error claiming request {key} for {app_id}: {e}")
+                return None
+
+        try:
+            item = self._table.get_item(Key={"pk": pk}, ConsistentRead=True).get(
+                "Item"
+            )
+        except Exception as e:
+            print(f"Error loading request {key} for {app_id}: {e}")
+            item = None
+        if not item or item.get("pending"):
+            return {"pending": True, "body_hash": item and item.get("body_hash")}
+        return {
+            "pending": False,
+            "body_hash": item.get("body_hash"),
+            "response": json.loads(item["response_json"]),
+        }
+
+    def complete_request(
+        self,
+        app_id: str,
+        key: str,
+        body_hash: str,
+        response: Dict[str, Any],
+        ttl_seconds: int,
+    ) -> None:
+        try:
+            self._table.put_item(
+                Item={
+                    "pk": f"request#{app_id}#{key}",
+                    "pending": False,
+                    "body_hash": body_hash,
+                    "response_json": json.dumps(response),
+                    "expires_at": int(time.time()) + ttl_seconds,
+                    "app_id": app_id,
+                }
+            )
+
+        except Exception as e:
+            print(f"Error saving request {key} for {app_id}: {e}")
+
+    def release_request(self, app_id: str, key: str) -> None:
+        try:
+            self._table.delete_item(Key={"pk": f"request#{app_id}#{key}"})
+
+        except Exception as e:
+            print(f"Error releasing request {key} for {app_id}: {e}")
+
+    def add_to_analytics(
+        self,
+        app_id: str,
+        item_key: str,
+        counters: Dict[str, float],
+        gauges: Dict[str, float],
+        maxima: Dict[str, float],
+        expires_at: int,
+    ) -> None:
+        """Add counters, overwrite gauges and raise maxima on one analytics item"""
+        from botocore.exceptions import ClientError  # type: ignore
+
+        pk = f"analytics#{app_id}#{item_key}"
+        names: Dict[str, str] = {}
+        values: Dict[str, Any] = {":expires_at": expires_at}
+        sets = ["expires_at = :expires_at"]
+        adds = []
+        for i, (name, value) in enumerate(counters.items()):
+            names[f"#c{i}"] = name
+            values[f":c{i}"] = Decimal(str(value))
+            adds.append(f"#c{i} :c{i}")
+        for i, (name, value) in enumerate(gauges.items()):
+            names[f"#g{i}"] = name
+            values[f":g{i}"] = Decimal(str(value))
+            sets.append(f"#g{i} = :g{i}")
+        expression = "SET " + ", ".join(sets)
+        if adds:
+            expression += " ADD " + ", ".join(adds)
+        try:
+            # ADD keeps concurrent instances' counts; gauges are last writer wins
+            update_kwargs: Dict[str, Any] = {
+                "Key": {"pk": pk},
+                "UpdateExpression": expression,
+                "ExpressionAttributeValues": values,
+            }
+            if names:
+                update_kwargs["ExpressionAttributeNames"] = names
+            self._table.update_item(**update_kwargs)
+
+            # DynamoDB has no atomic max, so each maximum is a conditional set
+            for name, value in maxima.items():
+                try:
+                    self._table.update_item(
+                        Key={"pk": pk},
+                        UpdateExpression="SET #m = :m",
+                        ConditionExpression="attribute_not_exists(#m) OR #m < :m",
+                        ExpressionAttributeNames={"#m": name},
+                        ExpressionAttributeValues={":m": Decimal(str(value))},
+                    )
+                except ClientError as e:
+                    if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                        raise
+
+        except Exception as e:
+            print(f"Error saving analytics {item_key} for {app_id}: {e}")
+
+    def load_analytics(
+        self, app_id: str, item_keys: List[str]
+    ) -> Dict[str, Dict[str, float]]:
+        prefix = f"analytics#{app_id}#"
+        items: Dict[str, Dict[str, float]] = {}
+        try:
+            for start in range(0, len(item_keys), 100):
+                request = {
+                    self._table_name: {
+                        "Keys": [{"pk": prefix + key} for key in item_keys[start : start + 100]]
+                    }
+                }
+                while request:
+                    response = self._ddb.batch_get_item(RequestItems=request)
+                    for item in response.get("Responses", {}).get(self._table_name, []):
+                        items[item["pk"][len(prefix) :]] = {
+                            name: float(value)
+                            for name, value in item.items()
+                            if name != "pk"
+                        }
+                    request = response.get("UnprocessedKeys") or None
+
+        except Exception as e:
+            print(f"Error loading analytics for {app_id}: {e}")
+        return items
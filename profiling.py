@@ -0,0 +1,162 @@
+import cProfile
+import functools
+import inspect
+import io
+import marshal
+import pstats
+import random
+import threading
+from typing import Any, Dict, Optional
+
+from fastapi.routing import APIRoute
+
+# Sort orders accepted by report_text: the pstats.SortKey values plus the
+# abbreviations sort_stats also understands (tottime, cumtime, ...)
+SORT_KEYS = sorted(pstats.Stats.sort_arg_dict_default)
+
+
+class RequestProfiler:
+    """On-demand cProfile capture around route handlers.
+
+    Switched on for the next N requests or a percentage sample. Each
+    sampled handler runs under its own cProfile.Profile, which also covers
+    the QueueController and persistence calls it makes, and the result is
+    merged into one in-memory pstats.Stats. Aggregates are per process, so
+    on Lambda each warm instance keeps its own. When disabled the only
+    cost per request is one attribute check.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._remaining = 0
+        self._sample_rate = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats: Optional[pstats.Stats] = None
+        self._profiled_requests = 0
+        self._requests_by_route: Dict[str, int] = {}
+
+    def start(self, requests: int = 0, sample_percent: float = 0.0):
+        with self._lock:
+            self._remaining = requests
+            self._sample_rate = sample_percent / 100
+            self.enabled = requests > 0 or sample_percent > 0
+
+    def stop(self):
+        with self._lock:
+            self.enabled = False
+            self._remaining = 0
+            self._sample_rate = 0.0
+
+    def reset(self):
+        with self._lock:
+            self._stats = None
+            self._profiled_requests = 0
+            self._requests_by_route = {}
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "remaining_requests": self._remaining,
+            "sample_percent": self._sample_rate * 100,
+            "profiled_requests": self._profiled_requests,
+            "requests_by_route": dict(self._requests_by_route),
+        }
+
+    def begin(self) -> Optional[cProfile.Profile]:
+        if not self.enabled or getattr(self._local, "active", False):
+            return None
+        with self._lock:
+            if self._remaining > 0:
+                self._remaining -= 1
+                if self._remaining == 0 and not self._sample_rate:
+                    self.enabled = False
+            elif random.random() >= self._sample_rate:
+                return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler already owns this interpreter
+            return None
+        self._local.active = True
+        return profile
+
+    def end(self, profile: cProfile.Profile, route_name: str):
+        profile.disable()
+        self._local.active = False
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self._profiled_requests += 1
+            self._requests_by_route[route_name] = (
+                self._requests_by_route.get(route_name, 0) + 1
+            )
+
+    def report_text(self, sort: str = "cumulative", limit: int = 50) -> str:
+        with self._lock:
+            if self._stats is None:
+                return "No profiled requests yet.\n"
+            output = io.StringIO()
+            self._stats.stream = output
+            self._stats.sort_stats(sort).print_stats(limit)
+            return output.getvalue()
+
+    def report_pstats(self) -> Optional[bytes]:
+        """Marshalled stats, loadable with pstats.Stats(path) or snakeviz"""
+        with self._lock:
+            if self._stats is None:
+                return None
+            return marshal.dumps(self._stats.stats)
+
+
+profiler = RequestProfiler()
+
+
+def profiled(route_name: str, func):
+    """Wrap func to run under the profiler when sampled; already wrapped
+    endpoints come back unchanged, since include_router rebuilds each route
+    of a ProfiledRoute router as another ProfiledRoute"""
+    if getattr(func, "_profiled", False):
+        return func
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            profile = profiler.begin()
+            if profile is None:
+                return await func(*args, **kwargs)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                profiler.end(profile, route_name)
+
+        async_wrapper._profiled = True
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = profiler.begin()
+        if profile is None:
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.end(profile, route_name)
+
+    wrapper._profiled = True
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint runs under the request profiler when sampled"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        # Leave the profiling controls themselves out of the samples
+        if not path.startswith("/profiling"):
+            route_name = f"{','.join(sorted(kwargs.get('methods') or []))} {path}"
+            endpoint = profiled(route_name, endpoint)
+        super().__init__(path, endpoint, **kwargs)
@@ -1,15 +1,30 @@
 from typing import List, Dict, Optional
 from fastapi import HTTPException
-from persistence import InMemoryPersistence, DynamoDBPersistence
+from analytics import QueueAnalytics
+from guest_store import GuestQueue
+from persistence import InMemoryPersistence, DynamoDBPersistence, get_codec
+from status_publisher import StatusPublisher
+from tickets import TicketBook
 import os
-from datetime import datetime, timezone
+import time
+from datetime import date, datetime, timezone
+
+# Venue occupancy is kept outside the queue state so clicker presses are a
+# single atomic counter update rather than a rewrite of the whole queue
+GUESTS_IN_VENUE_COUNTER = "guests_in_venue"
+
+# Shared across instances, so versions on saved state and published
+# snapshots only ever go up whichever instance wrote them
+STATE_VERSION_COUNTER = "state_version"
+
+# How long a loaded position index may serve ticket position reads
+POSITION_INDEX_TTL_SECONDS = 1.0
 
 
 class QueueController:
     def __init__(self):
-        self.queue: List[
-            Dict[str, any]
-        ] = []  # Each guest is a dict: {"email": str, "premium": bool}
+        self.queue = GuestQueue()  # Ordered guests with their premium flags
+        self.tickets = TicketBook()  # Counters for ticket-based position reads
         self.is_open = True
         self.premium_limit = 3  # Default limit, can be changed via admin
         self.one_shot_price = 5  # Default price in dollars
@@ -23,11 +38,21 @@ class QueueController:
         # persistence
         self._app_id = os.getenv("APP_ID", "default")
         table_name = os.getenv("DDB_TABLE_NAME")
+        codec_name = os.getenv("STATE_CODEC")
+        codec = get_codec(codec_name) if codec_name else None
         self._store = (
-            DynamoDBPersistence(table_name) if table_name else InMemoryPersistence()
+            DynamoDBPersistence(table_name, codec=codec)
+            if table_name
+            else InMemoryPersistence(codec=codec)
         )
         self._last_load_time = None
         self._mock_guest_counter = 0  # Counter for mock guest names
+        self._version = 0  # From STATE_VERSION_COUNTER on every save
+        self._position_index: Optional[TicketBook] = None
+        self._position_index_loaded_at = 0.0
+        self._publisher = StatusPublisher.from_env(self._app_id, self._store)
+        # Time series kept in the store, shared by every instance
+        self.analytics = QueueAnalytics.from_env(self._store, self._app_id)
         self._load()
 
     def _ensure_fresh_state(self):
@@ -47,32 +72,62 @@ class QueueController:
         # Check if daily reset is needed
         self.auto_daily_reset_if_needed()
 
-        if self.ready_pool_limit and self.ready_pool_limit > 0:
-            ready_count = min(self.ready_pool_limit, len(self.queue))
+        return self._status_from_state(self._serialize())
+
+    def get_status_summary(self):
+        """Status without the guest list, for pollers that only need counts"""
+        self._ensure_fresh_state()
+        self.auto_daily_reset_if_needed()
+        return self._summary_from_state(self._serialize())
+
+    @staticmethod
+    def _summary_from_state(state: Dict[str, any]) -> Dict[str, any]:
+        guests = state["queue"]
+        return {
+            "is_open": state["is_open"],
+            "premium_limit": state["premium_limit"],
+            "one_shot_price": state["one_shot_price"],
+            "premium_access_enabled": state["premium_access_enabled"],
+            "venue_mode_enabled": state["venue_mode_enabled"],
+            "venue_capacity": state["venue_capacity"],
+            "ready_pool_limit": state["ready_pool_limit"],
+            "total_guests": len(guests),
+            "premium_count": guests.premium_count(),
+        }
+
+    @staticmethod
+    def _status_from_state(state: Dict[str, any]) -> Dict[str, any]:
+        guests = state["queue"]
+        ready_pool_limit = state["ready_pool_limit"]
+        if ready_pool_limit and ready_pool_limit > 0:
+            ready_count = min(ready_pool_limit, len(guests))
         else:
-            ready_count = 1 if len(self.queue) > 0 else 0
-
-        queue_with_location: List[Dict[str, any]] = []
-        for index, guest in enumerate(self.queue):
-            queue_with_location.append(
-                {
-                    "email": guest.get("email"),
-                    "premium": guest.get("premium", False),
-                    "guest_location": "ready" if index < ready_count else "in queue",
-                }
-            )
+            ready_count = 1 if len(guests) > 0 else 0
+
+        queue_with_location: List[Dict[str, any]] = [
+            {
+                "email": email,
+                "premium": premium,
+                "guest_location": "ready" if index < ready_count else "in queue",
+            }
+            for index, (email, premium) in enumerate(guests.iter_guests())
+        ]
 
         return {
-            "is_open": self.is_open,
+            "is_open": state["is_open"],
             "queue": queue_with_location,
-            "premium_limit": self.premium_limit,
-            "one_shot_price": self.one_shot_price,
-            "premium_access_enabled": self.premium_access_enabled,
-            "venue_mode_enabled": self.venue_mode_enabled,
-            "venue_capacity": self.venue_capacity,
-            "guests_in_venue": self.guests_in_venue,
-            "ready_pool_limit": self.ready_pool_limit,
-            "ready_pool": self.get_ready_pool(),
+            "premium_limit": state["premium_limit"],
+            "one_shot_price": state["one_shot_price"],
+            "premium_access_enabled": state["premium_access_enabled"],
+            "venue_mode_enabled": state["venue_mode_enabled"],
+            "venue_capacity": state["venue_capacity"],
+            "guests_in_venue": state["guests_in_venue"],
+            "ready_pool_limit": ready_pool_limit,
+            "ready_pool": (
+                guests.to_list(stop=ready_pool_limit)
+                if ready_pool_limit and ready_pool_limit > 0
+                else []
+            ),
         }
 
     ### joining and leaving the queue
@@ -80,9 +135,11 @@ class QueueController:
     def join_queue(self, email: str):
         if not self.is_open:
             raise HTTPException(status_code=403, detail="Queue is closed.")
-        if not any(g["email"] == email for g in self.queue):
-            self.queue.append({"email": email, "premium": False})
+        if email not in self.queue:
+            ticket = self.tickets.issue()
+            self.queue.append(email, ticket=ticket, joined_at=time.time())
             self._save()
+            self._record("join", 1)
 
     def join_premium_queue(self, email: str):
         if not self.is_open:
@@ -101,52 +158,93 @@ class QueueController:
             )
 
         # Remove guest if already in queue
-        existing_guest = None
-        for i, guest in enumerate(self.queue):
-            if guest["email"] == email:
-                if guest.get("premium"):
-                    raise HTTPException(
-                        status_code=400, detail="Guest already in premium queue."
-                    )
-                existing_guest = self.queue.pop(i)
-                break
+        # Upgrading keeps the original join time so wait covers the whole stay
+        joined_at = None
+        existing_index = self.queue.index(email)
+        if existing_index >= 0:
+            if self.queue.is_premium_at(existing_index):
+                raise HTTPException(
+                    status_code=400, detail="Guest already in premium queue."
+                )
+            joined_at = self._remove_guest(existing_index)
 
         # Check premium slot availability
-        premium_count = sum(1 for g in self.queue[1:] if g["premium"])
+        premium_count = self.queue.premium_count(start=1)
         if premium_count >= self.premium_limit:
             raise HTTPException(status_code=403, detail="No premium slots available.")
 
         # Insert at next available premium position (starting at index 1)
         insert_index = 1
-        while insert_index < len(self.queue) and self.queue[insert_index]["premium"]:
+        while insert_index < len(self.queue) and self.queue.is_premium_at(insert_index):
             insert_index += 1
 
-        self.queue.insert(insert_index, {"email": email, "premium": True})
+        ticket = self.tickets.issue()
+        self.tickets.add_premium(ticket)
+        self.queue.insert(
+            insert_index,
+            email,
+            premium=True,
+            ticket=ticket,
+            joined_at=joined_at if joined_at is not None else time.time(),
+        )
         self._save()
+        if joined_at is None:
+            self._record("join", 1)
+        else:
+            self._record(None)
 
     def get_position(self, email: str) -> int:
-        for i, guest in enumerate(self.queue):
-            if guest["email"] == email:
-                return i
-        raise HTTPException(status_code=404, detail="Guest not in queue.")
+        index = self.queue.index(email)
+        if index < 0:
+            raise HTTPException(status_code=404, detail="Guest not in queue.")
+        return index
+
+    def get_ticket(self, email: str) -> int:
+        return self.queue.ticket_at(self.get_position(email))
+
+    def get_guest_position(self, email: str) -> Dict[str, any]:
+        """Position, ticket and premium flag from a single queue lookup"""
+        index = self.get_position(email)
+        return {
+            "position": index,
+            "ticket": self.queue.ticket_at(index),
+            "premium": self.queue.is_premium_at(index),
+        }
+
+    def get_ticket_position(self, ticket: int) -> Dict[str, any]:
+        """Position from the small ticket index alone, without loading the queue"""
+        now = time.monotonic()
+        if (
+            self._position_index is None
+            or now - self._position_index_loaded_at > POSITION_INDEX_TTL_SECONDS
+        ):
+            self._position_index = TicketBook.from_dict(
+                self._store.load_position_index(self._app_id)
+            )
+            self._position_index_loaded_at = now
+
+        position = self._position_index.position(ticket)
+        if position is None:
+            raise HTTPException(status_code=404, detail="Guest not in queue.")
+        return {
+            "ticket": ticket,
+            "position": position,
+            "premium": ticket in self._position_index.premium,
+            "guest_location": self._position_index.location(position),
+        }
 
     def advance_queue(self):
-        if self.venue_mode_enabled and self.is_venue_full():
-            raise HTTPException(status_code=403, detail="Venue is full.")
         if self.queue:
-            self.queue.pop(0)
-            if self.venue_mode_enabled:
-                self.increment_guests_in_venue()
-            self._save()
+            joined_at = self._admit(0)
+            self._record("advance", 1, [joined_at])
 
     def leave_queue(self, email: str):
-        for i, guest in enumerate(self.queue):
-            if guest["email"] == email:
-                self.queue.pop(i)
-                if self.venue_mode_enabled:
-                    self.increment_guests_in_venue()
-                self._save()
-                return
+        index = self.queue.index(email)
+        if index >= 0:
+            # Leaving is not an admission, so it never takes a venue slot
+            self._remove_guest(index)
+            self._save()
+            self._record("leave", 1)
 
     ### basic queue settings
 
@@ -158,18 +256,22 @@ class QueueController:
 
     def reset_queue(self):
         self.queue.clear()
+        self.tickets.reset()
         self._save()
+        self._record(None)
 
     def mock_guests(self, count: int):
+        now = time.time()
         for i in range(count):
+            ticket = self.tickets.issue()
             self.queue.append(
-                {
-                    "email": f"mock{self._mock_guest_counter}@example.com",
-                    "premium": False,
-                }
+                f"mock{self._mock_guest_counter}@example.com",
+                ticket=ticket,
+                joined_at=now,
             )
             self._mock_guest_counter += 1
         self._save()
+        self._record("join", count)
 
     def reset_mock_counter(self):
         """Reset the mock guest counter back to 0"""
@@ -192,10 +294,10 @@ class QueueController:
         self._save()
 
     def is_premium(self, email: str) -> bool:
-        for guest in self.queue:
-            if guest["email"] == email:
-                return guest["premium"]
-        raise HTTPException(status_code=404, detail="Guest not in queue.")
+        index = self.queue.index(email)
+        if index < 0:
+            raise HTTPException(status_code=404, detail="Guest not in queue.")
+        return self.queue.is_premium_at(index)
 
     ### venue mode functionality
 
@@ -205,8 +307,10 @@ class QueueController:
         self.venue_mode_enabled = enabled
         # Reset venue guest count when mode changes
         if not enabled:
-            self.guests_in_venue = 0
+            self._set_guests_in_venue(0)
         self._save()
+        if enabled:
+            self._publish_venue()
 
     def set_venue_capacity(self, capacity: int):
         self._ensure_fresh_state()
@@ -221,18 +325,48 @@ class QueueController:
         )
 
     def increment_guests_in_venue(self):
-        if self.venue_mode_enabled and self.guests_in_venue < self.venue_capacity:
-            self.guests_in_venue += 1
-        else:
+        # Occupancy lives in its own counter; the capacity check is part of the
+        # atomic update so concurrent admissions cannot overshoot it
+        new_count = None
+        if self.venue_mode_enabled:
+            new_count = self._store.add_to_counter(
+                self._app_id,
+                GUESTS_IN_VENUE_COUNTER,
+                1,
+                max_value=self.venue_capacity,
+            )
+        if new_count is None:
+            self._refresh_guests_in_venue()
             raise HTTPException(status_code=403, detail="Venue is full.")
-        self._save()
+        self.guests_in_venue = new_count
+        self._publish_venue()
 
     def decrement_guests_in_venue(self):
-        if self.venue_mode_enabled and self.guests_in_venue > 0:
-            self.guests_in_venue -= 1
-        else:
+        new_count = None
+        if self.venue_mode_enabled:
+            new_count = self._store.add_to_counter(
+                self._app_id, GUESTS_IN_VENUE_COUNTER, -1, min_value=0
+            )
+        if new_count is None:
+            self._refresh_guests_in_venue()
             raise HTTPException(status_code=400, detail="No guests in venue to remove.")
-        self._save()
+        self.guests_in_venue = new_count
+        self._publish_venue()
+        self._record(None)
+
+    def _set_guests_in_venue(self, count: int):
+        self._store.set_counter(self._app_id, GUESTS_IN_VENUE_COUNTER, count)
+        self.guests_in_venue = count
+        self._publish_venue()
+
+    def _refresh_guests_in_venue(self):
+        count = self._store.get_counter(self._app_id, GUESTS_IN_VENUE_COUNTER)
+        if count is None:
+            # Seed the counter from state saved before occupancy was split out
+            count = self._store.seed_counter(
+                self._app_id, GUESTS_IN_VENUE_COUNTER, self.guests_in_venue
+            )
+        self.guests_in_venue = count
 
     ### daily reset functionality
 
@@ -241,20 +375,24 @@ class QueueController:
         self._ensure_fresh_state()
 
         # Clear queue contents but preserve configuration
-        old_queue = self.queue.copy()
+        guests_cleared = len(self.queue)
         self.queue.clear()
-        self.guests_in_venue = 0
+        self.tickets.reset()
+        self._set_guests_in_venue(0)
 
         # Save the reset state
         self._save()
+        archive_key = self.analytics.archive_day()
+        self._record(None)
 
         print(
-            f"Daily reset completed at {datetime.now(timezone.utc)}. Cleared {len(old_queue)} guests from queue."
+            f"Daily reset completed at {datetime.now(timezone.utc)}. Cleared {guests_cleared} guests from queue."
         )
         return {
-            "message": f"Daily reset completed. Cleared {len(old_queue)} guests from queue.",
-            "guests_cleared": len(old_queue),
+            "message": f"Daily reset completed. Cleared {guests_cleared} guests from queue.",
+            "guests_cleared": guests_cleared,
             "reset_time": datetime.now(timezone.utc).isoformat(),
+            "analytics_archive": archive_key,
         }
 
     def should_daily_reset(self) -> bool:
@@ -289,36 +427,102 @@ class QueueController:
 
     def get_ready_pool(self) -> List[Dict[str, any]]:
         if self.ready_pool_limit and self.ready_pool_limit > 0:
-            return self.queue[: min(self.ready_pool_limit, len(self.queue))]
+            return self.queue.to_list(stop=self.ready_pool_limit)
         return []
 
     def scan_guest(self, email: str):
-        if self.venue_mode_enabled and self.is_venue_full():
-            raise HTTPException(status_code=403, detail="Venue is full.")
-        for i, guest in enumerate(self.queue):
-            if guest["email"] == email:
-                # Enforce readiness
-                if self.ready_pool_limit and self.ready_pool_limit > 0:
-                    if i >= min(self.ready_pool_limit, len(self.queue)):
-                        raise HTTPException(
-                            status_code=403, detail="Guest is not in the ready pool."
-                        )
-                else:
-                    if i != 0:
-                        raise HTTPException(
-                            status_code=403, detail="Guest is not ready."
-                        )
-
-                self.queue.pop(i)
-                if self.venue_mode_enabled:
-                    self.increment_guests_in_venue()
-                self._save()
-                return
-        raise HTTPException(status_code=404, detail="Guest not in queue.")
+        i = self.queue.index(email)
+        if i < 0:
+            raise HTTPException(status_code=404, detail="Guest not in queue.")
+
+        # Enforce readiness
+        if self.ready_pool_limit and self.ready_pool_limit > 0:
+            if i >= min(self.ready_pool_limit, len(self.queue)):
+                raise HTTPException(
+                    status_code=403, detail="Guest is not in the ready pool."
+                )
+        else:
+            if i != 0:
+                raise HTTPException(status_code=403, detail="Guest is not ready.")
+
+        joined_at = self._admit(i)
+        self._record("scan", 1, [joined_at])
+
+    def _admit(self, index: int) -> float:
+        """Move the guest at index into the venue and save; returns their join time"""
+        # Claim the venue slot first so a full venue leaves the queue untouched;
+        # the shared counter decides, not this instance's cached occupancy
+        claimed = self.venue_mode_enabled
+        if claimed:
+            self.increment_guests_in_venue()
+        joined_at = self._remove_guest(index)
+        try:
+            self._save()
+        except HTTPException:
+            # The failed save put the guest back in the queue, so hand back the slot
+            if claimed:
+                new_count = self._store.add_to_counter(
+                    self._app_id, GUESTS_IN_VENUE_COUNTER, -1, min_value=0
+                )
+                if new_count is not None:
+                    self.guests_in_venue = new_count
+                    self._publish_venue()
+            raise
+        return joined_at
+
+    def _remove_guest(self, index: int) -> float:
+        """Pop the guest at index and release their ticket; returns their join time"""
+        _, premium, ticket, joined_at = self.queue.pop(index)
+        self.tickets.release(ticket, premium)
+        return joined_at
+
+    ### analytics
+
+    def get_analytics(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        resolution: Optional[str] = None,
+    ) -> Dict[str, any]:
+        end = end if end is not None else time.time()
+        start = start if start is not None else end - 3600
+        if start > end:
+            raise HTTPException(status_code=400, detail="Start must be before end.")
+        try:
+            return self.analytics.query(start, end, resolution)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    def get_analytics_archive(self, day: str) -> Dict[str, any]:
+        try:
+            archive_date = date.fromisoformat(day)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Day must be YYYY-MM-DD.")
+        archive = self.analytics.load_archive(archive_date)
+        if archive is None:
+            raise HTTPException(status_code=404, detail="No archive for that day.")
+        return archive
+
+    def _record(
+        self,
+        event: Optional[str],
+        count: int = 0,
+        joined_at: Optional[List[float]] = None,
+    ):
+        self.analytics.record(
+            event,
+            {
+                "queue_length": len(self.queue),
+                "premium_count": self.queue.premium_count(),
+                "guests_in_venue": self.guests_in_venue,
+            },
+            count,
+            joined_at or (),
+        )
 
     def _serialize(self) -> Dict[str, any]:
         return {
-            "queue": self.queue,
+            "queue": self.queue.snapshot(),
             "is_open": self.is_open,
             "premium_limit": self.premium_limit,
             "one_shot_price": self.one_shot_price,
@@ -328,10 +532,19 @@ class QueueController:
             "guests_in_venue": self.guests_in_venue,
             "ready_pool_limit": self.ready_pool_limit,
             "mock_guest_counter": self._mock_guest_counter,
+            "version": self._version,
+            "tickets": self._ticket_index(),
         }
 
+    def _ticket_index(self) -> Dict[str, any]:
+        self.tickets.head_pinned = bool(self.tickets.premium) and not (
+            self.queue and self.queue.is_premium_at(0)
+        )
+        self.tickets.ready_pool_limit = self.ready_pool_limit
+        return self.tickets.to_dict()
+
     def _hydrate(self, state: Dict[str, any]):
-        self.queue = state.get("queue", [])
+        self.queue = GuestQueue.from_state(state.get("queue", []))
         self.is_open = state.get("is_open", True)
         self.premium_limit = state.get("premium_limit", 0)
         self.one_shot_price = state.get("one_shot_price", 5)
@@ -341,12 +554,15 @@ class QueueController:
         self.guests_in_venue = state.get("guests_in_venue", 0)
         self.ready_pool_limit = state.get("ready_pool_limit", 0)
         self._mock_guest_counter = state.get("mock_guest_counter", 0)
+        self._version = state.get("version", 0)
+        self.tickets = TicketBook.from_dict(state.get("tickets"))
 
     def _load(self):
         try:
             state = self._store.load_state(self._app_id)
             if state:
                 self._hydrate(state)
+            self._refresh_guests_in_venue()
             self._last_load_time = datetime.now(timezone.utc)
         except Exception:
             # best-effort load; remain with defaults on error
@@ -354,7 +570,42 @@ class QueueController:
 
     def _save(self):
         try:
-            self._store.save_state(self._app_id, self._serialize())
+            self._version = self._next_version()
+            state = self._serialize()
+            self._store.save_state(self._app_id, state)
         except Exception:
-            # best-effort save; ignore errors in stateless/local mode
-            pass
+            # Drop the unsaved change so memory matches the stored state
+            self._load()
+            raise HTTPException(status_code=500, detail="Could not save queue state.")
+        self._store.save_position_index(self._app_id, state["tickets"])
+        self._position_index = TicketBook.from_dict(state["tickets"])
+        self._position_index_loaded_at = time.monotonic()
+        self._publish_state(state)
+
+    def _next_version(self) -> int:
+        return self._store.add_to_counter(self._app_id, STATE_VERSION_COUNTER, 1)
+
+    def _publish_state(self, state: Dict[str, any]):
+        """Publish what was just saved; only called once the save succeeded"""
+        if not self._publisher:
+            return
+        # Tickets first: guest pages poll it for their position
+        self._publisher.publish(
+            "tickets", state["version"], {"is_open": state["is_open"], **state["tickets"]}
+        )
+        self._publisher.publish(
+            "status", state["version"], self._summary_from_state(state)
+        )
+
+    def _publish_venue(self):
+        """Occupancy comes from the atomic counter, so it is published on its own"""
+        if not self._publisher:
+            return
+        try:
+            version = self._next_version()
+        except Exception as e:
+            print(f"Error publishing venue occupancy: {e}")
+            return
+        self._publisher.publish(
+            "venue", version, {"guests_in_venue": self.guests_in_venue}
+        )
@@ -0,0 +1,162 @@
+"""Replay a request capture against the API and report latency.
+
+Captures are written by RequestCaptureMiddleware when REQUEST_CAPTURE_PATH is
+set. Replay in-process against main.app (persistence writes are counted) or
+against a running server such as a local uvicorn:
+
+    python replay.py capture.jsonl --speed 10
+    python replay.py capture.jsonl --speed 0 --url http://127.0.0.1:8000
+
+--speed 1 keeps the recorded spacing, 10 runs ten times faster and 0 sends
+requests back to back. Requests are sent one at a time in recorded order.
+Requests whose body was truncated at capture are skipped and counted, since
+resending a cut-off body would only produce errors the live API never saw.
+"""
+
+import argparse
+import json
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+PERSISTENCE_WRITE_METHODS = [
+    "save_state",
+    "set_counter",
+    "seed_counter",
+    "add_to_counter",
+    "raise_counter",
+    "save_position_index",
+    "claim_request",
+    "complete_request",
+    "release_request",
+    "add_to_analytics",
+]
+
+
+def load_capture(path: str) -> List[Dict]:
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                events.append(json.loads(line))
+    events.sort(key=lambda e: e["ts"])
+    return events
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def count_persistence_writes(store) -> Dict[str, int]:
+    """Wrap the store's write methods so each call is tallied"""
+    counts: Dict[str, int] = defaultdict(int)
+    for name in PERSISTENCE_WRITE_METHODS:
+        original = getattr(store, name, None)
+        if original is None:
+            continue
+
+        def counted(*args, _name=name, _original=original, **kwargs):
+            counts[_name] += 1
+            return _original(*args, **kwargs)
+
+        setattr(store, name, counted)
+    return counts
+
+
+def replay(events: List[Dict], client, speed: float) -> Dict[str, List[float]]:
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    if not events:
+        return latencies
+
+    first_ts = events[0]["ts"]
+    started = time.perf_counter()
+    for event in events:
+        if event.get("body_truncated"):
+            continue
+        if speed > 0:
+            delay = (event["ts"] - first_ts) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+        url = event["path"]
+        if event.get("query"):
+            url = f"{url}?{event['query']}"
+        headers = {}
+        if event.get("content_type"):
+            headers["content-type"] = event["content_type"]
+        if event.get("idempotency_key"):
+            headers["idempotency-key"] = event["idempotency_key"]
+
+        request_started = time.perf_counter()
+        client.request(
+            event["method"],
+            url,
+            content=event.get("body", "").encode("utf-8"),
+            headers=headers,
+        )
+        elapsed_ms = (time.perf_counter() - request_started) * 1000
+        latencies[f"{event['method']} {event['path']}"].append(elapsed_ms)
+    return latencies
+
+
+def print_report(
+    latencies: Dict[str, List[float]], write_counts=None, skipped: int = 0
+):
+    all_latencies = [v for values in latencies.values() for v in values]
+    rows = sorted(latencies.items()) + [("TOTAL", all_latencies)]
+    print(f"{'endpoint':<40}{'count':>8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for name, values in rows:
+        print(
+            f"{name:<40}{len(values):>8}"
+            f"{percentile(values, 50):>10.2f}{percentile(values, 90):>10.2f}"
+            f"{percentile(values, 99):>10.2f}{max(values, default=0.0):>10.2f}"
+        )
+    if skipped:
+        print(f"\nSkipped {skipped} requests with truncated bodies")
+    if write_counts is not None:
+        print("\nPersistence writes:")
+        for name in PERSISTENCE_WRITE_METHODS:
+            print(f"  {name}: {write_counts.get(name, 0)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="JSONL capture written by the middleware")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Replay speed multiplier; 0 replays as fast as possible",
+    )
+    parser.add_argument(
+        "--url", help="Base URL of a running server; defaults to in-process app"
+    )
+    args = parser.parse_args()
+
+    events = load_capture(args.capture)
+    skipped = sum(1 for event in events if event.get("body_truncated"))
+
+    if args.url:
+        import httpx
+
+        with httpx.Client(base_url=args.url) as client:
+            latencies = replay(events, client, args.speed)
+        print_report(latencies, skipped=skipped)
+    else:
+        from fastapi.testclient import TestClient
+        from main import app
+        from queue_instance import queue
+
+        write_counts = count_persistence_writes(queue._store)
+        with TestClient(app) as client:
+            latencies = replay(events, client, args.speed)
+        print_report(latencies, write_counts, skipped)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue as queue_module
+import time
+from typing import Optional
+
+
+class RequestCaptureMiddleware:
+    """Record API traffic as JSONL for offline replay (see replay.py).
+
+    Each request is written as one line with method, path, query string,
+    Idempotency-Key (so retries replay as retries), body (truncated to
+    max_body_bytes), status and duration. Lines are handed to a background
+    listener so the request thread never blocks on disk, and the file
+    rotates at max_bytes keeping backup_count old files.
+    """
+
+    def __init__(
+        self,
+        app,
+        path: str,
+        max_body_bytes: int = 4096,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+    ):
+        self.app = app
+        self._max_body_bytes = max_body_bytes
+
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        # Bounded so a stalled disk drops captures instead of growing memory
+        self._records: queue_module.Queue = queue_module.Queue(maxsize=10000)
+        self._listener = logging.handlers.QueueListener(self._records, file_handler)
+        self._listener.start()
+        atexit.register(self._listener.stop)
+
+        self._logger = logging.getLogger(f"request_capture.{path}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._logger.addHandler(_DroppingQueueHandler(self._records))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.time()
+        body_chunks = []
+        body_size = 0
+        status_code: Optional[int] = None
+
+        async def capture_receive():
+            nonlocal body_size
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                if body_size < self._max_body_bytes:
+                    body_chunks.append(chunk[: self._max_body_bytes - body_size])
+                body_size += len(chunk)
+            return message
+
+        async def capture_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            self._record(scope, started, b"".join(body_chunks), body_size, status_code)
+
+    def _record(self, scope, started, body, body_size, status_code):
+        headers = dict(scope.get("headers") or [])
+        record = {
+            "ts": started,
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "content_type": headers.get(b"content-type", b"").decode("latin-1"),
+            "idempotency_key": headers.get(b"idempotency-key", b"").decode("latin-1"),
+            "body": body.decode("utf-8", errors="replace"),
+            "body_truncated": body_size > len(body),
+            "status": status_code,
+            "duration_ms": round((time.time() - started) * 1000, 3),
+        }
+        self._logger.info(json.dumps(record))
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue_module.Full:
+            pass
@@ -1,23 +1,36 @@
-from fastapi import APIRouter
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse, Response
 from models import Guest
+from profiling import SORT_KEYS, ProfiledRoute, profiler
 
 # from queue_controller import QueueController
 from queue_instance import queue
 
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 # queue = QueueController()
 
 
 @router.post("/join")
 def join_queue(guest: Guest):
     queue.join_queue(guest.email)
-    return {"message": "Joined queue", "position": queue.get_position(guest.email)}
+    guest_position = queue.get_guest_position(guest.email)
+    return {
+        "message": "Joined queue",
+        "position": guest_position["position"],
+        "ticket": guest_position["ticket"],
+    }
 
 
 @router.get("/position/{email}")
 def get_position(email: str):
-    return {"position": queue.get_position(email)}
+    return queue.get_guest_position(email)
+
+
+@router.get("/position/ticket/{ticket}")
+def get_ticket_position(ticket: int):
+    return queue.get_ticket_position(ticket)
 
 
 @router.post("/advance")
@@ -62,6 +75,11 @@ def get_status():
     }
 
 
+@router.get("/status/summary")
+def get_status_summary():
+    return queue.get_status_summary()
+
+
 @router.post("/open")
 def open_queue():
     queue.open_queue()
@@ -108,3 +126,68 @@ def set_premium_access(data: dict):
 def set_one_shot_price(data: dict):
     queue.set_one_shot_price(data["price"])
     return {"message": f"One-shot price set to {data['price']}"}
+
+
+@router.post("/profiling/start")
+def start_profiling(payload: dict):
+    requests = payload.get("requests", 0)
+    sample_percent = payload.get("sample_percent", 0)
+    if not isinstance(requests, int) or requests < 0:
+        raise HTTPException(
+            status_code=400, detail="Requests must be a non-negative integer."
+        )
+    if not isinstance(sample_percent, (int, float)) or not 0 <= sample_percent <= 100:
+        raise HTTPException(
+            status_code=400, detail="Sample percent must be between 0 and 100."
+        )
+    profiler.start(requests=requests, sample_percent=sample_percent)
+    return {"message": "Profiling started", **profiler.status()}
+
+
+@router.post("/profiling/stop")
+def stop_profiling():
+    profiler.stop()
+    return {"message": "Profiling stopped", **profiler.status()}
+
+
+@router.post("/profiling/reset")
+def reset_profiling():
+    profiler.reset()
+    return {"message": "Profiling data cleared"}
+
+
+@router.get("/profiling/status")
+def profiling_status():
+    return profiler.status()
+
+
+@router.get("/profiling/report")
+def profiling_report(format: str = "text", sort: str = "cumulative", limit: int = 50):
+    if format == "pstats":
+        data = profiler.report_pstats()
+        if data is None:
+            raise HTTPException(status_code=404, detail="No profiled requests yet.")
+        return Response(
+            content=data,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": 'attachment; filename="deliq.pstats"'},
+        )
+    if sort not in SORT_KEYS:
+        raise HTTPException(
+            status_code=400, detail=f"Sort must be one of: {', '.join(SORT_KEYS)}."
+        )
+    return PlainTextResponse(profiler.report_text(sort=sort, limit=limit))
+
+
+@router.get("/analytics")
+def get_analytics(
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    resolution: Optional[str] = None,
+):
+    return queue.get_analytics(start, end, resolution)
+
+
+@router.get("/analytics/archive/{day}")
+def get_analytics_archive(day: str):
+    return queue.get_analytics_archive(day)
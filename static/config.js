@@ -4,4 +4,6 @@
 
 window.API_BASE = "https://x6vlu0t4s9.execute-api.eu-north-1.amazonaws.com/prod";
 
-
+// Optional: read the queue summary and ticket positions from snapshots published by the API,
+// e.g. "status/default" on the static bucket or "/static/status/default" locally with STATUS_PUBLISH_DIR=static
+//window.STATUS_BASE = "status/default";
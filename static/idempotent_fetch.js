@@ -0,0 +1,39 @@
+/**
+ * Idempotent Requests
+ * Sends one user action with an Idempotency-Key and retries it with the same
+ * key, so a dropped response never applies the action twice on the server
+ */
+(function() {
+    'use strict';
+
+    function newIdempotencyKey() {
+        if (window.crypto && window.crypto.randomUUID) {
+            return window.crypto.randomUUID();
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    }
+
+    /**
+     * fetch() for a single user action
+     * Network errors, 5xx and 409 (original still in progress) are retried
+     * with the same key; any other response is returned as-is
+     * @param {string} url - Request URL
+     * @param {Object} options - fetch() options
+     * @param {number} retries - Extra attempts after the first
+     */
+    async function idempotentFetch(url, options = {}, retries = 2) {
+        const headers = { ...(options.headers || {}), 'Idempotency-Key': newIdempotencyKey() };
+        for (let attempt = 0; ; attempt++) {
+            try {
+                const response = await fetch(url, { ...options, headers });
+                const retryable = response.status >= 500 || response.status === 409;
+                if (!retryable || attempt >= retries) return response;
+            } catch (error) {
+                if (attempt >= retries) throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, 500 * 2 ** attempt));
+        }
+    }
+
+    window.idempotentFetch = idempotentFetch;
+})();
@@ -0,0 +1,94 @@
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+
+class S3SnapshotWriter:
+    def __init__(self, bucket_name: str, max_age: int):
+        import boto3  # type: ignore
+
+        self._bucket_name = bucket_name
+        self._cache_control = f"public, max-age={max_age}"
+        self._s3 = boto3.client("s3")
+
+    def write(self, key: str, body: bytes) -> None:
+        self._s3.put_object(
+            Bucket=self._bucket_name,
+            Key=key,
+            Body=body,
+            ContentType="application/json",
+            CacheControl=self._cache_control,
+        )
+
+
+class LocalSnapshotWriter:
+    """Stand-in for the bucket; point it somewhere under static/ to serve it"""
+
+    def __init__(self, directory: str):
+        self._directory = directory
+
+    def write(self, key: str, body: bytes) -> None:
+        path = os.path.join(self._directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a half-written file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+
+class StatusPublisher:
+    """Publish small public snapshots as static JSON for read-only pollers.
+
+    Objects under status/<app_id>/, none of which hold guest emails:
+    status.json (queue summary and settings), tickets.json (the ticket
+    index from tickets.py, from which a guest page works out its own
+    position) and venue.json (occupancy, on counter changes).
+
+    Each object carries a version from the store's shared version counter.
+    Before writing, the publisher raises a per-object counter in the store
+    to that version and skips the write if another instance already
+    published a newer one, so a stale instance cannot overwrite a newer
+    snapshot. Objects are a few hundred bytes and are written before the
+    request returns: on Lambda a background writer would be frozen with
+    the handler and could leave guests on a stale position.
+    """
+
+    def __init__(self, writer, store, app_id: str):
+        self._writer = writer
+        self._store = store
+        self._app_id = app_id
+        self._prefix = f"status/{app_id}/"
+
+    @classmethod
+    def from_env(cls, app_id: str, store) -> Optional["StatusPublisher"]:
+        """Configure from STATUS_PUBLISH_BUCKET or STATUS_PUBLISH_DIR, if set"""
+        bucket_name = os.getenv("STATUS_PUBLISH_BUCKET")
+        directory = os.getenv("STATUS_PUBLISH_DIR")
+        max_age = int(os.getenv("STATUS_PUBLISH_MAX_AGE", "2"))
+        if bucket_name:
+            writer = S3SnapshotWriter(bucket_name, max_age)
+        elif directory:
+            writer = LocalSnapshotWriter(directory)
+        else:
+            return None
+        return cls(writer, store, app_id)
+
+    def publish(self, name: str, version: int, payload: Dict[str, Any]) -> bool:
+        """Write name.json unless version is already published; True if written"""
+        try:
+            if not self._store.raise_counter(self._app_id, f"published_{name}", version):
+                return False
+            body = {
+                **payload,
+                "version": version,
+                "published_at": datetime.now(timezone.utc).isoformat(),
+            }
+            self._writer.write(
+                f"{self._prefix}{name}.json", json.dumps(body).encode("utf-8")
+            )
+            return True
+        except Exception as e:
+            print(f"Error publishing {name} snapshot: {e}")
+            return False
@@ -0,0 +1,34 @@
+import time
+
+from analytics import QueueAnalytics
+from persistence import InMemoryPersistence
+
+GAUGES = {"queue_length": 1, "premium_count": 0, "guests_in_venue": 0}
+
+
+def test_instances_share_buckets():
+    store = InMemoryPersistence()
+    first = QueueAnalytics(store, "test")
+    second = QueueAnalytics(store, "test")
+
+    first.record("join", GAUGES, 2)
+    second.record("join", GAUGES, 3)
+    # Wait measured on another instance from the join time in queue state
+    second.record("scan", GAUGES, 1, [time.time() - 30])
+
+    now = time.time()
+    for analytics in (first, second):
+        series = analytics.query(now - 60, now, "minute")
+        assert sum(series["joins"]) == 5
+        assert sum(series["scans"]) == 1
+        assert sum(series["wait_count"]) == 1
+        assert 30 <= max(series["wait_max"]) < 40
+
+
+def test_unknown_join_time_is_not_a_wait():
+    analytics = QueueAnalytics(InMemoryPersistence(), "test")
+    analytics.record("advance", GAUGES, 1, [0.0])
+    now = time.time()
+    series = analytics.query(now - 10, now, "second")
+    assert sum(series["advances"]) == 1
+    assert sum(series["wait_count"]) == 0
@@ -0,0 +1,106 @@
+import hashlib
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from idempotency import IdempotencyMiddleware
+from persistence import InMemoryPersistence
+
+
+@pytest.fixture
+def store():
+    return InMemoryPersistence()
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def client(store, calls):
+    app = FastAPI()
+
+    @app.post("/join")
+    def join(payload: dict):
+        calls.append(payload)
+        return {"joined": payload["email"], "call": len(calls)}
+
+    @app.post("/flaky")
+    def flaky():
+        calls.append(None)
+        if len(calls) == 1:
+            return JSONResponse({"detail": "try again"}, status_code=503)
+        return {"call": len(calls)}
+
+    app.add_middleware(IdempotencyMiddleware, store=store, app_id="test")
+    return TestClient(app)
+
+
+def post(client, path, key, body=None):
+    return client.post(path, json=body or {}, headers={"Idempotency-Key": key})
+
+
+def claim_elsewhere(store, key, body):
+    """Claim key the way another instance's in-flight request would"""
+    store.claim_request("test", key, hashlib.sha256(body).hexdigest(), 20)
+
+
+def post_raw(client, path, key, body):
+    return client.post(
+        path,
+        content=body,
+        headers={"Idempotency-Key": key, "Content-Type": "application/json"},
+    )
+
+
+def test_retry_replays_stored_response(client, calls):
+    first = post(client, "/join", "k1", {"email": "a@x"})
+    retry = post(client, "/join", "k1", {"email": "a@x"})
+
+    assert len(calls) == 1
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+
+
+def test_key_reused_with_different_body_is_rejected(client, calls):
+    post(client, "/join", "k1", {"email": "a@x"})
+    response = post(client, "/join", "k1", {"email": "b@x"})
+
+    assert response.status_code == 422
+    assert len(calls) == 1
+
+
+def test_pending_claim_returns_conflict(client, store, calls):
+    body = b'{"email":"a@x"}'
+    claim_elsewhere(store, "POST /join k1", body)
+    response = post_raw(client, "/join", "k1", body)
+
+    assert response.status_code == 409
+    assert calls == []
+
+
+def test_server_error_releases_key(client, calls):
+    first = post(client, "/flaky", "k1")
+    retry = post(client, "/flaky", "k1")
+
+    assert first.status_code == 503
+    assert retry.status_code == 200
+    assert "idempotent-replayed" not in retry.headers
+    assert len(calls) == 2
+
+
+def test_expired_lease_can_be_reclaimed(client, store, calls, monkeypatch):
+    # The first attempt died after claiming the key and never completed it
+    body = b'{"email":"a@x"}'
+    claim_elsewhere(store, "POST /join k1", body)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 21)
+    response = post_raw(client, "/join", "k1", body)
+
+    assert response.status_code == 200
+    assert len(calls) == 1
@@ -0,0 +1,24 @@
+from fastapi.testclient import TestClient
+
+import main
+import profiling
+from profiling import profiler
+
+
+def test_included_routes_draw_one_sample_per_request(monkeypatch):
+    draws = []
+
+    def never_sample():
+        draws.append(1)
+        return 0.99
+
+    monkeypatch.setattr(profiling.random, "random", never_sample)
+    client = TestClient(main.app)
+    profiler.start(sample_percent=50)
+    try:
+        for _ in range(4):
+            assert client.get("/status/summary").status_code == 200
+    finally:
+        profiler.stop()
+    # A route wrapped twice would draw twice and be sampled at 75%
+    assert len(draws) == 4
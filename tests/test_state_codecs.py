@@ -0,0 +1,156 @@
+import json
+import struct
+
+import pytest
+
+from guest_store import GuestQueue
+from persistence import (
+    CODECS,
+    STATE_SCHEMA_VERSION,
+    BinaryStateCodec,
+    InMemoryPersistence,
+    JsonStateCodec,
+    StateDecodeError,
+)
+from tickets import TicketBook
+
+
+def build_state(count: int = 20):
+    queue = GuestQueue()
+    tickets = TicketBook()
+    for i in range(count):
+        ticket = tickets.issue()
+        premium = i % 7 == 3
+        if premium:
+            tickets.add_premium(ticket)
+        queue.append(f"guest{i}@example.com", premium, ticket)
+    return {
+        "queue": queue.snapshot(),
+        "is_open": True,
+        "premium_limit": 3,
+        "one_shot_price": 5,
+        "premium_access_enabled": True,
+        "venue_mode_enabled": False,
+        "venue_capacity": 10,
+        "guests_in_venue": 2,
+        "ready_pool_limit": 0,
+        "mock_guest_counter": 4,
+        "version": 9,
+        "tickets": tickets.to_dict(),
+    }
+
+
+def settings(state):
+    return {k: v for k, v in state.items() if k != "queue"}
+
+
+@pytest.mark.parametrize("codec", CODECS.values(), ids=CODECS.keys())
+def test_round_trip(codec):
+    state = build_state()
+    decoded = codec.decode(codec.encode(state))
+    assert decoded["queue"].to_list() == state["queue"].to_list()
+    assert settings(decoded) == settings(state)
+
+
+@pytest.mark.parametrize("codec", CODECS.values(), ids=CODECS.keys())
+def test_round_trip_empty_queue(codec):
+    state = build_state(count=0)
+    decoded = codec.decode(codec.encode(state))
+    assert len(decoded["queue"]) == 0
+    assert settings(decoded) == settings(state)
+
+
+@pytest.mark.parametrize("codec", CODECS.values(), ids=CODECS.keys())
+def test_in_memory_store_round_trip(codec):
+    store = InMemoryPersistence(codec=codec)
+    state = build_state()
+    store.save_state("test", state)
+    assert store.load_state("test")["queue"].to_list() == state["queue"].to_list()
+
+
+def test_binary_rejects_overlong_email():
+    queue = GuestQueue()
+    queue.append("a" * 70_000)
+    state = {**build_state(count=0), "queue": queue.snapshot()}
+    with pytest.raises(ValueError):
+        BinaryStateCodec().encode(state)
+
+
+def test_json_v1_state_is_migrated():
+    # The original blob: no schema_version, no later fields, guests as dicts
+    v1 = {
+        "queue": [
+            {"email": "a@example.com", "premium": False},
+            {"email": "b@example.com", "premium": True},
+            {"email": "c@example.com", "premium": False},
+        ],
+        "is_open": True,
+        "premium_limit": 3,
+        "one_shot_price": 5,
+        "venue_mode_enabled": False,
+        "venue_capacity": 0,
+        "guests_in_venue": 0,
+        "ready_pool_limit": 0,
+    }
+    state = JsonStateCodec().decode(json.dumps(v1).encode("utf-8"))
+
+    assert state["premium_access_enabled"] is False
+    assert state["mock_guest_counter"] == 0
+    assert [guest["ticket"] for guest in state["queue"].to_list()] == [0, 1, 2]
+    book = TicketBook.from_dict(state["tickets"])
+    for index, guest in enumerate(state["queue"].to_list()):
+        assert book.position(guest["ticket"]) == index
+
+
+def test_binary_v2_state_is_migrated():
+    # v2 binary layout has no ticket column
+    v2_settings = {k: v for k, v in settings(build_state(count=0)).items() if k != "tickets"}
+    header = json.dumps(v2_settings).encode("utf-8")
+    emails = ["a@example.com", "b@example.com"]
+    data = b"".join(
+        [
+            BinaryStateCodec.MAGIC,
+            struct.pack("<HI", 2, len(header)),
+            header,
+            struct.pack("<I", len(emails)),
+            struct.pack("<2H", *map(len, emails)),
+            bytes([0b10]),
+            "".join(emails).encode("utf-8"),
+        ]
+    )
+    state = BinaryStateCodec().decode(data)
+
+    assert [guest["email"] for guest in state["queue"].to_list()] == emails
+    assert [guest["premium"] for guest in state["queue"].to_list()] == [False, True]
+    book = TicketBook.from_dict(state["tickets"])
+    for index, guest in enumerate(state["queue"].to_list()):
+        assert book.position(guest["ticket"]) == index
+
+
+@pytest.mark.parametrize("codec", CODECS.values(), ids=CODECS.keys())
+def test_truncated_data_raises(codec):
+    data = codec.encode(build_state())
+    with pytest.raises((StateDecodeError, ValueError)):
+        codec.decode(data[: len(data) // 2])
+
+
+def test_future_schema_version_raises():
+    state = {**settings(build_state(count=0)), "queue": []}
+    data = json.dumps({**state, "schema_version": STATE_SCHEMA_VERSION + 1}).encode(
+        "utf-8"
+    )
+    with pytest.raises(StateDecodeError):
+        JsonStateCodec().decode(data)
+
+
+@pytest.mark.parametrize("codec", CODECS.values(), ids=CODECS.keys())
+def test_join_times_round_trip(codec):
+    queue = GuestQueue()
+    queue.append("a@example.com", ticket=0, joined_at=1700000000.25)
+    queue.append("b@example.com", ticket=1)
+    state = {**build_state(count=0), "queue": queue.snapshot()}
+    decoded = codec.decode(codec.encode(state))
+    assert [guest["joined_at"] for guest in decoded["queue"].to_list()] == [
+        1700000000.25,
+        0.0,
+    ]
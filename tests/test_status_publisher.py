@@ -0,0 +1,32 @@
+import json
+
+from persistence import InMemoryPersistence
+from status_publisher import LocalSnapshotWriter, StatusPublisher
+
+
+def test_older_version_from_another_instance_is_not_written(tmp_path):
+    store = InMemoryPersistence()
+    writer = LocalSnapshotWriter(str(tmp_path))
+    fresh = StatusPublisher(writer, store, "test")
+    stale = StatusPublisher(writer, store, "test")
+    path = tmp_path / "status" / "test" / "status.json"
+
+    assert fresh.publish("status", 5, {"total_guests": 3})
+    assert not stale.publish("status", 4, {"total_guests": 9})
+    data = json.loads(path.read_text())
+    assert data["version"] == 5
+    assert data["total_guests"] == 3
+
+
+def test_snapshot_is_written_before_publish_returns(tmp_path):
+    publisher = StatusPublisher(
+        LocalSnapshotWriter(str(tmp_path)), InMemoryPersistence(), "test"
+    )
+    path = tmp_path / "status" / "test" / "tickets.json"
+
+    for version in range(1, 6):
+        assert publisher.publish("tickets", version, {"next_ticket": version})
+        assert json.loads(path.read_text())["next_ticket"] == version
+    # Republishing a version already out is skipped
+    assert not publisher.publish("tickets", 5, {"next_ticket": 99})
+    assert json.loads(path.read_text())["next_ticket"] == 5
@@ -0,0 +1,145 @@
+import random
+
+from tickets import TicketBook
+
+
+def test_positions_follow_issue_order():
+    book = TicketBook()
+    tickets = [book.issue() for _ in range(5)]
+    assert [book.position(t) for t in tickets] == [0, 1, 2, 3, 4]
+
+
+def test_release_shifts_later_tickets():
+    book = TicketBook()
+    tickets = [book.issue() for _ in range(5)]
+    book.release(tickets[0], premium=False)
+    book.release(tickets[2], premium=False)
+    assert book.position(tickets[0]) is None
+    assert book.position(tickets[2]) is None
+    assert [book.position(t) for t in (tickets[1], tickets[3], tickets[4])] == [0, 1, 2]
+    # The head left, so the watermark moved past it
+    assert book.served_watermark == 1
+
+
+def test_premium_block_after_pinned_head():
+    book = TicketBook()
+    regular = [book.issue() for _ in range(3)]
+    premium = book.issue()
+    book.add_premium(premium)
+    book.head_pinned = True
+    assert book.position(regular[0]) == 0
+    assert book.position(premium) == 1
+    assert book.position(regular[1]) == 2
+
+
+def test_reset_invalidates_issued_tickets():
+    book = TicketBook()
+    tickets = [book.issue() for _ in range(3)]
+    book.reset()
+    assert all(book.position(t) is None for t in tickets)
+    assert book.position(book.issue()) == 0
+
+
+def test_dict_round_trip():
+    book = TicketBook()
+    tickets = [book.issue() for _ in range(6)]
+    book.release(tickets[2], premium=False)
+    book.add_premium(tickets[4])
+    book.head_pinned = True
+    book.ready_pool_limit = 2
+
+    restored = TicketBook.from_dict(book.to_dict())
+    assert restored.to_dict() == book.to_dict()
+    assert [restored.position(t) for t in tickets] == [book.position(t) for t in tickets]
+
+
+def test_rebuild_matches_queue_order():
+    flags = [False, True, True, False, False]
+    book, tickets = TicketBook.rebuild(flags)
+    assert book.head_pinned
+    assert [book.position(t) for t in tickets] == list(range(len(flags)))
+
+
+def test_controller_positions_match_queue():
+    from queue_controller import QueueController
+
+    rng = random.Random(1234)
+    controller = QueueController()
+    controller.premium_access_enabled = True
+    controller.premium_limit = 5
+    next_guest = 0
+    for _ in range(500):
+        op = rng.random()
+        emails = [guest["email"] for guest in controller.queue.to_list()]
+        try:
+            if op < 0.45 or not emails:
+                controller.join_queue(f"g{next_guest}@example.com")
+                next_guest += 1
+            elif op < 0.55:
+                controller.join_premium_queue(rng.choice(emails))
+            elif op < 0.7:
+                controller.advance_queue()
+            elif op < 0.8:
+                controller.leave_queue(rng.choice(emails))
+            elif op < 0.9:
+                controller.ready_pool_limit = rng.choice([0, 3])
+                controller.scan_guest(rng.choice(emails[:3]))
+            else:
+                controller.mock_guests(2)
+        except Exception:
+            pass
+
+        controller._save()
+        for index, guest in enumerate(controller.queue.to_list()):
+            result = controller.get_ticket_position(guest["ticket"])
+            assert result["position"] == index
+
+
+def test_stuck_head_keeps_one_removed_run():
+    # Head never shows while the ready pool behind them is scanned in order
+    book = TicketBook()
+    tickets = [book.issue() for _ in range(1000)]
+    for ticket in tickets[1:900]:
+        book.release(ticket, premium=False)
+    assert book.served_watermark == tickets[0]
+    assert book.to_dict()["removed_runs"] == [[tickets[1], tickets[900]]]
+    assert book.position(tickets[0]) == 0
+    assert book.position(tickets[900]) == 1
+
+
+def test_runs_match_naive_removed_set():
+    rng = random.Random(99)
+    book = TicketBook()
+    for _ in range(300):
+        book.issue()
+    removed = set()
+    for ticket in rng.sample(range(300), 200):
+        book.release(ticket, premium=False)
+        removed.add(ticket)
+        remaining = [t for t in range(300) if t not in removed]
+        for index, t in enumerate(remaining):
+            assert book.position(t) == index
+        assert all(book.position(t) is None for t in removed)
+
+
+def test_legacy_removed_list_is_read():
+    book = TicketBook.from_dict(
+        {"next_ticket": 6, "served_watermark": 1, "removed": [3, 2, 5], "premium": []}
+    )
+    assert book.to_dict()["removed_runs"] == [[2, 4], [5, 6]]
+    assert [book.position(t) for t in range(6)] == [None, 0, None, None, 1, None]
+
+
+def test_guest_position_matches_ticket_position():
+    from queue_controller import QueueController
+
+    controller = QueueController()
+    controller.premium_access_enabled = True
+    for email in ["a@x", "b@x", "c@x"]:
+        controller.join_queue(email)
+    controller.join_premium_queue("c@x")
+
+    result = controller.get_guest_position("c@x")
+    assert result == {"position": 1, "ticket": result["ticket"], "premium": True}
+    by_ticket = controller.get_ticket_position(result["ticket"])
+    assert (by_ticket["position"], by_ticket["premium"]) == (1, True)
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from persistence import InMemoryPersistence
+from queue_controller import GUESTS_IN_VENUE_COUNTER, QueueController
+from status_publisher import LocalSnapshotWriter, StatusPublisher
+
+
+def make_controller(store=None):
+    controller = QueueController()
+    if store is not None:
+        controller._store = store
+        controller.analytics._store = store
+        controller._load()
+    return controller
+
+
+def venue_with_guests(capacity, emails, store=None):
+    controller = make_controller(store)
+    controller.set_venue_mode(True)
+    controller.set_venue_capacity(capacity)
+    for email in emails:
+        controller.join_queue(email)
+    return controller
+
+
+def test_leaving_a_full_venue_queue_takes_no_slot():
+    controller = venue_with_guests(1, ["a@x", "b@x"])
+    controller.advance_queue()
+    assert controller.is_venue_full()
+
+    controller.leave_queue("b@x")
+    assert len(controller.queue) == 0
+    assert controller.guests_in_venue == 1
+
+
+def test_admission_uses_shared_counter_not_cached_occupancy():
+    store = InMemoryPersistence()
+    attendant = venue_with_guests(1, ["a@x", "b@x"], store)
+    clicker = make_controller(store)
+    attendant.advance_queue()
+    # Another instance lets the guest out; the attendant's copy still reads full
+    clicker.decrement_guests_in_venue()
+    assert attendant.is_venue_full()
+
+    attendant.advance_queue()
+    assert len(attendant.queue) == 0
+    assert store.get_counter(attendant._app_id, GUESTS_IN_VENUE_COUNTER) == 1
+
+
+def test_failed_save_hands_back_the_venue_slot(monkeypatch):
+    controller = venue_with_guests(2, ["a@x", "b@x"])
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("store unavailable")
+
+    monkeypatch.setattr(controller._store, "save_state", fail)
+    with pytest.raises(HTTPException) as excinfo:
+        controller.advance_queue()
+    assert excinfo.value.status_code == 500
+    assert len(controller.queue) == 2
+    store = controller._store
+    assert store.get_counter(controller._app_id, GUESTS_IN_VENUE_COUNTER) == 0
+    assert controller.guests_in_venue == 0
+
+
+def test_admissions_publish_venue_occupancy(tmp_path):
+    controller = make_controller()
+    controller._publisher = StatusPublisher(
+        LocalSnapshotWriter(str(tmp_path)), controller._store, controller._app_id
+    )
+    path = tmp_path / "status" / controller._app_id / "venue.json"
+    controller.set_venue_mode(True)
+    assert json.loads(path.read_text())["guests_in_venue"] == 0
+
+    controller.set_venue_capacity(2)
+    for email in ["a@x", "b@x"]:
+        controller.join_queue(email)
+    controller.advance_queue()
+    controller.scan_guest("b@x")
+    assert json.loads(path.read_text())["guests_in_venue"] == 2
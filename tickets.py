@@ -0,0 +1,166 @@
+import operator
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class TicketBook:
+    """Ticket counters that give a guest's position without the queue.
+
+    Every join takes the next ticket, and regular guests queue in ticket
+    order. Tickets below served_watermark are gone; the removed runs hold
+    tickets above it that are no longer regular guests (left, scanned out
+    of order, or upgraded to premium) as sorted, disjoint [start, end)
+    ranges. Neighbouring removals merge, so a head guest who never shows
+    while the ready pool is scanned behind them costs one run, not one
+    entry per guest, and position() is a bisect over the run starts.
+    Premium guests form a block near the front, in the order of the
+    premium list, after the head guest when head_pinned is set.
+    """
+
+    __slots__ = (
+        "next_ticket",
+        "served_watermark",
+        "premium",
+        "head_pinned",
+        "ready_pool_limit",
+        "_run_starts",
+        "_run_ends",
+        "_removed_before",
+    )
+
+    def __init__(self):
+        self.next_ticket = 0
+        self.served_watermark = 0
+        self.premium: List[int] = []
+        self.head_pinned = False
+        self.ready_pool_limit = 0
+        self._run_starts: List[int] = []
+        self._run_ends: List[int] = []
+        # _removed_before[i] is how many tickets the first i runs cover;
+        # None until the next read after a change
+        self._removed_before: Optional[List[int]] = None
+
+    @classmethod
+    def rebuild(cls, premium_flags: Iterable[bool]) -> Tuple["TicketBook", List[int]]:
+        """Issue fresh tickets to a queue, given each guest's premium flag"""
+        book = cls()
+        tickets = []
+        first_is_premium: Optional[bool] = None
+        for premium in premium_flags:
+            ticket = book.issue()
+            if premium:
+                book.add_premium(ticket)
+            if first_is_premium is None:
+                first_is_premium = premium
+            tickets.append(ticket)
+        book.head_pinned = bool(book.premium) and not first_is_premium
+        return book, tickets
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "TicketBook":
+        book = cls()
+        if data:
+            book.next_ticket = data.get("next_ticket", 0)
+            book.served_watermark = data.get("served_watermark", 0)
+            if "removed_runs" in data:
+                for start, end in data["removed_runs"]:
+                    book._run_starts.append(start)
+                    book._run_ends.append(end)
+            else:
+                # Written before runs: a flat list of removed tickets
+                for ticket in sorted(data.get("removed", [])):
+                    book._remove_regular(ticket)
+            book.premium = list(data.get("premium", []))
+            book.head_pinned = data.get("head_pinned", False)
+            book.ready_pool_limit = data.get("ready_pool_limit", 0)
+        return book
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "next_ticket": self.next_ticket,
+            "served_watermark": self.served_watermark,
+            "removed_runs": [
+                [start, end] for start, end in zip(self._run_starts, self._run_ends)
+            ],
+            "premium": list(self.premium),
+            "head_pinned": self.head_pinned,
+            "ready_pool_limit": self.ready_pool_limit,
+        }
+
+    ### updates, mirroring changes to the guest queue
+
+    def issue(self) -> int:
+        ticket = self.next_ticket
+        self.next_ticket += 1
+        return ticket
+
+    def add_premium(self, ticket: int):
+        self.premium.append(ticket)
+        self._remove_regular(ticket)
+
+    def release(self, ticket: int, premium: bool):
+        """A guest left the queue, whether served, scanned or gone"""
+        if premium:
+            if ticket in self.premium:
+                self.premium.remove(ticket)
+        else:
+            self._remove_regular(ticket)
+
+    def reset(self):
+        # Skip past every issued ticket so stale ones read as "not in queue"
+        self.served_watermark = self.next_ticket
+        self._run_starts.clear()
+        self._run_ends.clear()
+        self._removed_before = None
+        self.premium.clear()
+        self.head_pinned = False
+
+    def _remove_regular(self, ticket: int):
+        if ticket < self.served_watermark:
+            return
+        starts, ends = self._run_starts, self._run_ends
+        i = bisect_right(starts, ticket)
+        if i > 0 and ticket < ends[i - 1]:
+            return
+        joins_left = i > 0 and ends[i - 1] == ticket
+        joins_right = i < len(starts) and starts[i] == ticket + 1
+        if joins_left and joins_right:
+            ends[i - 1] = ends[i]
+            del starts[i], ends[i]
+        elif joins_left:
+            ends[i - 1] = ticket + 1
+        elif joins_right:
+            starts[i] = ticket
+        else:
+            starts.insert(i, ticket)
+            ends.insert(i, ticket + 1)
+        # A run starting at the watermark is simply served
+        if starts and starts[0] == self.served_watermark:
+            self.served_watermark = ends[0]
+            del starts[0], ends[0]
+        self._removed_before = None
+
+    ### reads
+
+    def position(self, ticket: int) -> Optional[int]:
+        """Queue index for ticket, or None if it is not in the queue"""
+        if ticket in self.premium:
+            return self.premium.index(ticket) + int(self.head_pinned)
+        if ticket < self.served_watermark or ticket >= self.next_ticket:
+            return None
+        runs_before = bisect_right(self._run_starts, ticket)
+        if runs_before and ticket < self._run_ends[runs_before - 1]:
+            return None
+        if self._removed_before is None:
+            run_lengths = map(operator.sub, self._run_ends, self._run_starts)
+            self._removed_before = list(accumulate(run_lengths, initial=0))
+        rank = ticket - self.served_watermark - self._removed_before[runs_before]
+        if self.head_pinned and rank == 0:
+            return 0
+        return rank + len(self.premium)
+
+    def location(self, position: int) -> str:
+        if self.ready_pool_limit and self.ready_pool_limit > 0:
+            return "ready" if position < self.ready_pool_limit else "in queue"
+        return "ready" if position == 0 else "in queue"